@@ -0,0 +1,119 @@
+# adaptive_scoring.py
+# Cheap per-row pre-check that decides when a plant needs a full autoencoder pass.
+
+import numpy as np
+
+# Reasons a row is sent to the autoencoder
+RUN_REASONS = ("first_row", "z_score", "drift", "active_anomaly", "max_interval")
+
+
+class AdaptiveScheduler:
+    """Per-plant gate deciding whether to run the LSTM on the current row.
+
+    Rows arrive already scaled by the training StandardScaler, so each value is
+    a z-score against the training mean/scale. Inference runs immediately when
+    a single row is out of range (|z| > z_threshold) or when an EWMA of the
+    scaled rows drifts past its control limit; otherwise it is deferred until
+    max_interval rows have passed since the last inference.
+    """
+
+    def __init__(self, n_features, max_interval=30, z_threshold=3.5,
+                 ewma_alpha=0.2, ewma_limit=3.0):
+        self.max_interval = max_interval
+        self.z_threshold = z_threshold
+        self.ewma_alpha = ewma_alpha
+        # Control limit in z units: L * sqrt(alpha / (2 - alpha))
+        self.ewma_bound = ewma_limit * np.sqrt(ewma_alpha / (2.0 - ewma_alpha))
+        self.ewma = np.zeros(n_features)
+
+        self.has_result = False
+        self.last_alerting = False
+        self.rows_since_run = 0
+
+        # Statistics
+        self.rows = 0
+        self.runs = 0
+        self.runs_by_reason = {r: 0 for r in RUN_REASONS}
+        self.late_detections = 0
+        self.late_latency_total = 0
+        self.late_latency_max = 0
+
+    def should_run(self, row_scaled):
+        """Update the pre-check with a scaled row and return (run, reason)"""
+        self.rows += 1
+        self.ewma = self.ewma_alpha * row_scaled + (1.0 - self.ewma_alpha) * self.ewma
+
+        if not self.has_result:
+            reason = "first_row"
+        elif np.max(np.abs(row_scaled)) > self.z_threshold:
+            reason = "z_score"
+        elif np.max(np.abs(self.ewma)) > self.ewma_bound:
+            reason = "drift"
+        elif self.last_alerting:
+            # Keep scoring every row until the model says the plant is normal again
+            reason = "active_anomaly"
+        elif self.rows_since_run + 1 >= self.max_interval:
+            reason = "max_interval"
+        else:
+            self.rows_since_run += 1
+            return False, "quiet"
+
+        self.runs += 1
+        self.runs_by_reason[reason] += 1
+        return True, reason
+
+    def record_result(self, severity, reason, onset_rows_ago=None):
+        """Record the severity of an inference triggered by should_run.
+
+        onset_rows_ago is how many rows before this one the anomaly started
+        (from the run's error map). An anomaly found after skipped rows was
+        detected late by the skipped rows it already covered.
+        """
+        newly_alerting = severity != "normal" and not self.last_alerting
+        if newly_alerting and self.rows_since_run and onset_rows_ago:
+            latency = min(onset_rows_ago, self.rows_since_run)
+            self.late_detections += 1
+            self.late_latency_total += latency
+            self.late_latency_max = max(self.late_latency_max, latency)
+
+        self.has_result = True
+        self.last_alerting = severity != "normal"
+        self.rows_since_run = 0
+
+    def stats(self):
+        """Return skip ratio and detection-latency statistics"""
+        skipped = self.rows - self.runs
+        return {
+            "rows": self.rows,
+            "inferences": self.runs,
+            "skipped": skipped,
+            "skip_ratio": round(skipped / self.rows, 4) if self.rows else 0.0,
+            "runs_by_reason": dict(self.runs_by_reason),
+            "late_detections": self.late_detections,
+            "mean_late_latency_rows": (
+                round(self.late_latency_total / self.late_detections, 2)
+                if self.late_detections else 0.0
+            ),
+            "max_late_latency_rows": self.late_latency_max,
+        }
+
+
+def summarize_stats(schedulers):
+    """Aggregate scheduler statistics across a fleet of plants"""
+    rows = sum(s.rows for s in schedulers)
+    runs = sum(s.runs for s in schedulers)
+    late = sum(s.late_detections for s in schedulers)
+    by_reason = {r: sum(s.runs_by_reason[r] for s in schedulers) for r in RUN_REASONS}
+    return {
+        "plants": len(schedulers),
+        "rows": rows,
+        "inferences": runs,
+        "skipped": rows - runs,
+        "skip_ratio": round((rows - runs) / rows, 4) if rows else 0.0,
+        "runs_by_reason": by_reason,
+        "late_detections": late,
+        "mean_late_latency_rows": (
+            round(sum(s.late_latency_total for s in schedulers) / late, 2) if late else 0.0
+        ),
+        "max_late_latency_rows": max((s.late_latency_max for s in schedulers), default=0),
+    }
@@ -0,0 +1,236 @@
+# alert_engine.py
+# Server-side alert state machine per plant, driven by calculate_severity output.
+#
+#   (none) --severity >= open level on min_duration of the last open_window rows--> open
+#   open --ack--> acknowledged
+#   open/acknowledged --severity <= clear level for clear_duration rows--> resolved
+#   open/acknowledged --plant state dropped, or over max_open--> expired
+#
+# Only transitions (opened, escalated, acknowledged, resolved) produce events,
+# so a plant hovering around a severity cut-point emits nothing new.
+
+import uuid
+from collections import OrderedDict, deque
+
+SEVERITY_RANK = {"normal": 0, "warning": 1, "high": 2, "critical": 3}
+
+
+class Alert:
+    """One alert episode of a plant"""
+
+    def __init__(self, alert_id, plant_id, severity, timestamp, context):
+        self.id = alert_id
+        self.plant_id = plant_id
+        self.state = "open"
+        self.severity = severity
+        self.peak_severity = severity
+        self.peak_score = context.get("raw_anomaly_score", 0.0)
+        self.opened_at = timestamp
+        self.acknowledged_at = None
+        self.acknowledged_by = None
+        self.resolved_at = None
+        self.rows = 0
+        self.context = context
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "plant_id": self.plant_id,
+            "state": self.state,
+            "severity": self.severity,
+            "peak_severity": self.peak_severity,
+            "peak_score": round(self.peak_score, 4),
+            "opened_at": self.opened_at,
+            "acknowledged_at": self.acknowledged_at,
+            "acknowledged_by": self.acknowledged_by,
+            "resolved_at": self.resolved_at,
+            "rows": self.rows,
+            "root_cause": self.context.get("root_cause"),
+            "recommendation": self.context.get("recommendation"),
+            "top_causes": self.context.get("top_causes", []),
+        }
+
+
+class PlantAlertTracker:
+    """Debounces the severity stream of one plant into alert transitions"""
+
+    def __init__(self, open_level="warning", clear_level="normal",
+                 min_duration=3, open_window=5, clear_duration=10, cooldown=30):
+        self.open_rank = SEVERITY_RANK[open_level]
+        self.clear_rank = SEVERITY_RANK[clear_level]
+        self.min_duration = min_duration
+        # k-of-n: a plant flapping around the cut-point still opens an alert
+        self.recent = deque(maxlen=max(open_window, min_duration))
+        self.clear_duration = clear_duration
+        self.cooldown = cooldown
+
+        self.active = None
+        self.clear_rows = 0
+        self.cooldown_left = 0
+
+    def update(self, severity, timestamp, context, new_id):
+        """Feed one severity; returns a list of (event, alert) transitions"""
+        rank = SEVERITY_RANK[severity]
+        if self.active is not None and self.active.state == "expired":
+            # Expired by the manager while this tracker was spilled or idle
+            self.active = None
+            self.clear_rows = 0
+        if self.cooldown_left > 0:
+            self.cooldown_left -= 1
+
+        if self.active is None:
+            self.recent.append(rank >= self.open_rank)
+            pending = sum(self.recent)
+            # Critical bypasses the cooldown
+            cooling = self.cooldown_left > 0 and rank < SEVERITY_RANK["critical"]
+            if pending >= self.min_duration and rank >= self.open_rank and not cooling:
+                self.active = Alert(new_id(), context["plant_id"], severity, timestamp, context)
+                self.active.rows = pending
+                self.recent.clear()
+                self.clear_rows = 0
+                return [("opened", self.active)]
+            return []
+
+        alert = self.active
+        alert.rows += 1
+        alert.severity = severity
+        alert.peak_score = max(alert.peak_score, context.get("raw_anomaly_score", 0.0))
+
+        if rank > SEVERITY_RANK[alert.peak_severity]:
+            alert.peak_severity = severity
+            alert.context = context
+            # An escalation needs a fresh acknowledgement
+            alert.state = "open"
+            self.clear_rows = 0
+            return [("escalated", alert)]
+
+        # Hysteresis: resolve only after a sustained return to the clear level
+        self.clear_rows = self.clear_rows + 1 if rank <= self.clear_rank else 0
+        if self.clear_rows >= self.clear_duration:
+            alert.state = "resolved"
+            alert.resolved_at = timestamp
+            self.active = None
+            self.clear_rows = 0
+            self.cooldown_left = self.cooldown
+            return [("resolved", alert)]
+        return []
+
+
+class AlertManager:
+    """Alert trackers for every plant plus a bounded, queryable alert history"""
+
+    def __init__(self, history_size=1000, max_open=1000, **tracker_config):
+        self.tracker_config = tracker_config
+        self.history = deque()
+        self.by_id = {}
+        self.history_size = history_size
+        self.open = OrderedDict()   # plant_id -> unresolved alert, oldest first
+        self.max_open = max_open
+
+        # Statistics
+        self.rows = 0
+        self.events = 0
+        self.expired = 0
+
+    def _new_id(self):
+        # Trackers outlive the process (plant state spill), so IDs must too
+        return f"alert-{uuid.uuid4().hex[:16]}"
+
+    def _record(self, alert):
+        if alert.id in self.by_id:
+            return
+        if len(self.history) >= self.history_size:
+            self._drop_oldest_resolved()
+        self.history.append(alert)
+        self.by_id[alert.id] = alert
+
+    def _drop_oldest_resolved(self):
+        # Unresolved alerts stay queryable and acknowledgeable however old they are;
+        # they are bounded by max_open
+        for i, old in enumerate(self.history):
+            if old.state in ("resolved", "expired"):
+                del self.history[i]
+                del self.by_id[old.id]
+                return
+
+    def _track_open(self, alert):
+        self.open[alert.plant_id] = alert
+        self.open.move_to_end(alert.plant_id)
+        while len(self.open) > self.max_open:
+            self.expire_plant(next(iter(self.open)))
+
+    def expire_plant(self, plant_id):
+        """Expire the plant's unresolved alert; called when its state is dropped"""
+        alert = self.open.pop(plant_id, None)
+        if alert is None:
+            return
+        # Its tracker is gone (or will drop the alert on its next row), so it can never resolve
+        alert.state = "expired"
+        self.expired += 1
+
+    def _event(self, name, alert):
+        self.events += 1
+        return {"type": "alert", "event": name, "alert": alert.to_dict()}
+
+    def new_tracker(self):
+        """Alert tracker for one plant; the caller keeps it with the plant's state"""
+        return PlantAlertTracker(**self.tracker_config)
+
+    def adopt(self, tracker):
+        """Re-link a tracker restored from disk to history, re-adding its open alert if unknown"""
+        alert = tracker.active
+        if alert is None:
+            return
+        alert = tracker.active = self.by_id.get(alert.id, alert)
+        if alert.state == "expired":
+            tracker.active = None
+            return
+        # Unknown after a restart or when older than the history: re-add it
+        self._record(alert)
+        self._track_open(alert)
+
+    def update(self, tracker, severity, timestamp, context):
+        """Feed one scored row; returns the transition events to broadcast"""
+        self.rows += 1
+        events = []
+        for name, alert in tracker.update(severity, timestamp, context, self._new_id):
+            self._record(alert)
+            if name == "resolved":
+                self.open.pop(alert.plant_id, None)
+            else:
+                self._track_open(alert)
+            events.append(self._event(name, alert))
+        return events
+
+    def acknowledge(self, alert_id, by=None, timestamp=None):
+        """Acknowledge an open alert; returns the event or None if not applicable"""
+        alert = self.by_id.get(alert_id)
+        if alert is None or alert.state != "open":
+            return None
+        alert.state = "acknowledged"
+        alert.acknowledged_at = timestamp
+        alert.acknowledged_by = by
+        return self._event("acknowledged", alert)
+
+    def query(self, plant_id=None, state=None, limit=100):
+        """Most recent alerts first, optionally filtered"""
+        out = []
+        for alert in reversed(self.history):
+            if plant_id is not None and alert.plant_id != plant_id:
+                continue
+            if state is not None and alert.state != state:
+                continue
+            out.append(alert.to_dict())
+            if len(out) >= limit:
+                break
+        return out
+
+    def stats(self):
+        return {
+            "rows": self.rows,
+            "events": self.events,
+            "events_per_row": round(self.events / self.rows, 6) if self.rows else 0.0,
+            "open": len(self.open),
+            "expired": self.expired,
+            "history": len(self.history),
+        }
@@ -2,19 +2,24 @@
 # Usage: uvicorn app:app --reloa                                                                                                                                                                                                                                                                                 --host 0.0.0.0 --port 8000
 
 import asyncio
+import hmac
 import uvicorn
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Depends, Header, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 import numpy as np
-import joblib
-import json
 import os
 from collections import deque
-import tensorflow as tf
-from typing import List, Dict
+from typing import List, Dict, Optional
+from adaptive_scoring import AdaptiveScheduler, summarize_stats
+from model_registry import ModelRegistry
+from threshold_estimator import PlantThreshold
+from alert_engine import AlertManager
+from energy_kpis import PlantEnergy
+from plant_state import PlantState, PlantStateManager, PlantNotAllowed
 
 MODEL_DIR = 'carbonedge_model'
+REGISTRY_PATH = 'model_registry.json'  # Optional; falls back to MODEL_DIR for every plant
 
 # -------------------------------------------------
 # GLOBAL CONFIG
@@ -22,6 +27,58 @@ MODEL_DIR = 'carbonedge_model'
 SEQUENCE_BUFFER = 60  # Keep last 60 rows for sequence building
 ROLLING_WINDOW = 30   # Rolling window for statistics
 
+# Adaptive scoring: skip autoencoder passes on quiet plants
+ADAPTIVE_SCORING = False     # Run the LSTM on every row when disabled
+ADAPTIVE_MAX_INTERVAL = 30   # Max rows between two inferences on a quiet plant
+ADAPTIVE_Z_THRESHOLD = 3.5   # Run immediately when any scaled sensor exceeds this |z|
+ADAPTIVE_EWMA_ALPHA = 0.2    # Smoothing factor of the drift detector
+ADAPTIVE_EWMA_LIMIT = 3.0    # Drift detector control limit (in EWMA sigmas)
+
+# Model registry
+MAX_LOADED_MODELS = 4        # LRU bound on model versions kept in memory
+MODEL_MEMORY_BUDGET_MB = 1024
+MODELS_ROOT = '.'            # Model paths given to the admin endpoints must resolve inside this directory
+
+# Per-plant online threshold recalibration
+THRESHOLD_MODE = "global"    # "global" | "plant" (plant estimate) | "max" (larger of both)
+PLANT_THRESHOLD_PERCENTILE = 99
+PLANT_THRESHOLD_DECAY = 0.999  # Effective memory of ~1000 inferences
+PLANT_THRESHOLD_WARMUP = 200   # Inferences before the plant estimate is trusted
+PLANT_THRESHOLD_BOUNDS = (0.5, 3.0)  # Clamp as factors of the global threshold
+
+# Alert engine: debounced alert transitions instead of per-row severity
+ALERT_OPEN_LEVEL = "warning"  # Severity that opens an alert
+ALERT_MIN_DURATION = 3        # Rows at/above ALERT_OPEN_LEVEL within ALERT_OPEN_WINDOW before opening
+ALERT_OPEN_WINDOW = 5         # Recent rows considered for opening (k-of-n)
+ALERT_CLEAR_DURATION = 10     # Consecutive normal rows before resolving (hysteresis)
+ALERT_COOLDOWN = 30           # Rows after resolving before a non-critical alert can reopen
+ALERT_HISTORY = 1000          # Alerts kept for /alerts queries
+ALERT_MAX_OPEN = 1000         # Unresolved alerts kept; the oldest is expired beyond this
+WS_DEFAULT_STREAM = "alerts"  # /ws stream without ?stream=: "alerts" or "predictions" (every row)
+
+# Plant state: bounded memory for per-plant buffers and history
+MAX_ACTIVE_PLANTS = 1000      # Resident plants before least recently used ones are evicted
+PLANT_MEMORY_BUDGET_MB = 256  # Estimated resident state budget across all plants
+PLANT_IDLE_TIMEOUT = 3600     # Seconds without rows before a plant is evicted
+EVICTION_INTERVAL = 60        # Seconds between idle sweeps
+PLANT_SPILL_DIR = 'plant_state'  # Evicted state is saved here for fast reload (None = drop)
+MAX_SPILLED_PLANTS = 10000    # Spill files kept; the oldest are deleted beyond this
+PLANT_SPILL_TTL = 7 * 86400   # Seconds a spilled plant is kept before its state is dropped
+PLANT_ALLOW_LIST = None       # Optional iterable of the only plant IDs accepted
+REQUIRE_REGISTRATION = False  # Only accept plants registered via POST /plants/{plant_id}
+
+# Admin endpoints (/admin/*, plant registration) require this value in the
+# X-Admin-Token header. Unset = open: registration is then NOT a security boundary.
+ADMIN_TOKEN = os.environ.get('CARBONEDGE_ADMIN_TOKEN')
+
+# Explainability: served by /explain/{plant_id}, not part of /ingest responses
+EXPLAIN_TREND_LEN = 100  # Model runs kept per plant for contribution trends
+EXPLAIN_ONSET_Z = 3.0    # Deviation (in MADs of the window's first half) marking the onset
+
+# Energy and CO2 KPIs: running totals per plant, shift and day (see energy_kpis.py for factors)
+SHIFT_HOURS = 8              # Shift length; shifts start at midnight
+ENERGY_RETENTION_DAYS = 31   # Days (and their shifts) kept per plant
+
 # -------------------------------------------------
 
 app = FastAPI(title="CarbonEdge AI Realtime API")
@@ -34,68 +91,100 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Load model, scaler, meta
-if not os.path.exists(MODEL_DIR):
+# Load model registry and the default model
+if not os.path.exists(REGISTRY_PATH) and not os.path.exists(MODEL_DIR):
     raise RuntimeError("Model directory not found. Run train_model.py first.")
 
 print("Loading model and artifacts...")
-try:
-    # Try standard loading (works for Keras 2 / Legacy H5)
-    ae = tf.keras.models.load_model(os.path.join(MODEL_DIR, 'ae_model'))
-except (ValueError, TypeError):
-    # Fallback for Keras 3 which doesn't support direct SavedModel loading
-    print("Using Keras 3 TFSMLayer fallback...")
-    class AEWrapper:
-        def __init__(self, path):
-            self.layer = tf.keras.layers.TFSMLayer(path, call_endpoint='serving_default')
-        
-        def predict(self, x, verbose=0):
-            # TFSMLayer returns a dict of tensors
-            out = self.layer(x)
-            # Return the first output value converted to numpy
-            return list(out.values())[0].numpy()
-            
-    ae = AEWrapper(os.path.join(MODEL_DIR, 'ae_model'))
-scaler = joblib.load(os.path.join(MODEL_DIR, 'scaler.pkl'))
+registry = ModelRegistry(
+    REGISTRY_PATH,
+    MODEL_DIR,
+    max_loaded=MAX_LOADED_MODELS,
+    memory_budget_mb=MODEL_MEMORY_BUDGET_MB,
+    models_root=MODELS_ROOT,
+)
+# Assigned models are loaded before serving; later loads run off the event loop
+registry.preload()
+
+alerts = AlertManager(
+    history_size=ALERT_HISTORY,
+    max_open=ALERT_MAX_OPEN,
+    open_level=ALERT_OPEN_LEVEL,
+    min_duration=ALERT_MIN_DURATION,
+    open_window=ALERT_OPEN_WINDOW,
+    clear_duration=ALERT_CLEAR_DURATION,
+    cooldown=ALERT_COOLDOWN,
+)
 
-with open(os.path.join(MODEL_DIR, 'meta.json')) as f:
-    meta = json.load(f)
+def new_plant_state(plant_id):
+    """Fresh stream state for a plant seen for the first time"""
+    bundle = registry.get(plant_id)
+    state = PlantState(plant_id, max(SEQUENCE_BUFFER, bundle.seq_len), ROLLING_WINDOW,
+                       trend_len=EXPLAIN_TREND_LEN)
+    state.alert_tracker = alerts.new_tracker()
+    state.energy = PlantEnergy(SHIFT_HOURS, ENERGY_RETENTION_DAYS)
+    return state
+
+# Sliding buffers hold raw (unscaled) rows, so a model swap that brings a new
+# scaler keeps stream state
+plants = PlantStateManager(
+    new_plant_state,
+    max_plants=MAX_ACTIVE_PLANTS,
+    memory_budget_mb=PLANT_MEMORY_BUDGET_MB,
+    idle_timeout=PLANT_IDLE_TIMEOUT,
+    spill_dir=PLANT_SPILL_DIR,
+    max_spilled=MAX_SPILLED_PLANTS,
+    spill_ttl=PLANT_SPILL_TTL,
+    allow_list=PLANT_ALLOW_LIST,
+    require_registration=REQUIRE_REGISTRATION,
+    on_reload=lambda state: alerts.adopt(state.alert_tracker),
+    on_drop=alerts.expire_plant,
+)
 
-COLUMNS = meta['columns']
-SEQ_LEN = meta['seq_len']
-THRESHOLD = meta['threshold']
+if REQUIRE_REGISTRATION and not ADMIN_TOKEN:
+    print("⚠ REQUIRE_REGISTRATION without CARBONEDGE_ADMIN_TOKEN: any client can register plants")
 
-# Sliding buffers per plant
-buffers = {'plant_1': deque(maxlen=SEQUENCE_BUFFER)}
-anomaly_history = {'plant_1': deque(maxlen=ROLLING_WINDOW)}
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """Reject admin requests without the configured token (no-op when ADMIN_TOKEN is unset)"""
+    if ADMIN_TOKEN and not hmac.compare_digest(x_admin_token or "", ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Admin token required")
 
-# Global state for health check and latest status
-latest_predictions = {}
-latest_sensor_values = {}
+def find_plant_state(plant_id):
+    """State of a known plant, reloading idle-evicted plants from disk; None if unknown"""
+    try:
+        return plants.get(plant_id, create=False)
+    except PlantNotAllowed:
+        return None
 
 # ---------------- WebSocket Manager ----------------
 
 class ConnectionManager:
+    """Websocket clients subscribed to "alerts" (transitions only) or "predictions" (every row + alerts)"""
     def __init__(self):
         self.active: List[WebSocket] = []
+        self.streams: Dict[WebSocket, str] = {}
+        self.sent = {"alerts": 0, "predictions": 0}
     
-    async def connect(self, ws: WebSocket):
+    async def connect(self, ws: WebSocket, stream: str = "alerts"):
         await ws.accept()
         self.active.append(ws)
+        self.streams[ws] = stream
     
     def disconnect(self, ws: WebSocket):
         if ws in self.active:
             self.active.remove(ws)
+        self.streams.pop(ws, None)
     
-    async def broadcast(self, message: dict):
-        alive = []
+    async def broadcast(self, message: dict, stream: str = "alerts"):
         for ws in list(self.active):
+            if stream == "predictions" and self.streams.get(ws) != "predictions":
+                continue
             try:
                 await ws.send_json(message)
-                alive.append(ws)
+                self.sent[stream] += 1
             except Exception as e:
                 print(f"WebSocket send error: {e}")
-        self.active = alive
+                self.disconnect(ws)
 
 manager = ConnectionManager()
 
@@ -106,55 +195,72 @@ class SensorRow(BaseModel):
     timestamp: str
     values: Dict[str, float]
 
+class ModelVersion(BaseModel):
+    version: str
+    path: Optional[str] = None  # Required the first time a version is registered
+
+class PlantModel(BaseModel):
+    model: str
+
+class AlertAck(BaseModel):
+    by: Optional[str] = None
+    timestamp: Optional[str] = None
+
 # ---------------- Helper Functions ----------------
 
-def preprocess_row(values_dict):
-    """Convert sensor dict to scaled numpy array"""
+def preprocess_row(values_dict, bundle):
+    """Convert sensor dict to a raw numpy row in the model's column order"""
     try:
-        row = [float(values_dict.get(c, 0.0)) for c in COLUMNS]
-        row = np.array(row).reshape(1, -1)
-        row_scaled = scaler.transform(row)
-        return row_scaled.flatten()
+        return np.array([float(values_dict.get(c, 0.0)) for c in bundle.columns])
     except Exception as e:
         print(f"Preprocessing error: {e}")
         raise
 
-def sequence_from_buffer(buf):
-    """Build sequence with zero-padding if needed"""
+def scale_rows(rows, bundle):
+    """Scale raw rows with the model's scaler"""
+    return bundle.scaler.transform(np.atleast_2d(rows))
+
+def sequence_from_buffer(buf, bundle):
+    """Build scaled sequence with zero-padding if needed"""
     try:
-        arr = np.array(list(buf))
+        seq_len = bundle.seq_len
+        arr = np.array(list(buf)[-seq_len:])
+        arr = scale_rows(arr, bundle)
         
-        if arr.shape[0] < SEQ_LEN:
+        if arr.shape[0] < seq_len:
             # Pad with zeros at the beginning
-            pad_rows = SEQ_LEN - arr.shape[0]
+            pad_rows = seq_len - arr.shape[0]
             pad = np.zeros((pad_rows, arr.shape[1]))
             arr = np.vstack([pad, arr])
-        elif arr.shape[0] > SEQ_LEN:
-            # Take last SEQ_LEN rows
-            arr = arr[-SEQ_LEN:]
         
-        return arr.reshape(1, SEQ_LEN, arr.shape[1])
+        return arr.reshape(1, seq_len, arr.shape[1])
     except Exception as e:
         print(f"Sequence building error: {e}")
         raise
 
-def compute_reconstruction_error(seq):
-    """Calculate reconstruction error from autoencoder"""
+async def compute_reconstruction_error(seq, bundle):
+    """Calculate reconstruction error from autoencoder (batched across plants)
+
+    Also returns the float16 per-timestep x per-sensor error map for /explain.
+    """
     try:
-        pred = ae.predict(seq, verbose=0)
-        mse = np.mean(np.square(pred - seq))
-        feature_errors = np.mean(np.square(pred - seq), axis=1)[0]
-        return float(mse), feature_errors
+        pred = await bundle.batcher.predict(seq[0])
+        sq_err = np.square(pred - seq[0])
+        mse = np.mean(sq_err)
+        feature_errors = np.mean(sq_err, axis=0)
+        # Clip first: a glitch or sentinel value beyond ~256 sigma would overflow to inf
+        err_map = np.minimum(sq_err, np.finfo(np.float16).max).astype(np.float16)
+        return float(mse), feature_errors, err_map
     except Exception as e:
         print(f"Reconstruction error calculation failed: {e}")
         raise
 
-def get_top_contributing_sensors(feature_errors, top_k=3):
+def get_top_contributing_sensors(feature_errors, columns, top_k=3):
     """Get sensors with highest reconstruction errors"""
     try:
         indices = np.argsort(feature_errors)[::-1][:top_k]
         return [
-            {"sensor": COLUMNS[idx], "error": float(feature_errors[idx])}
+            {"sensor": columns[idx], "error": float(feature_errors[idx])}
             for idx in indices
         ]
     except Exception as e:
@@ -238,6 +344,27 @@ def generate_recommendation(severity, top_sensors, root_cause):
     else:
         return f"Monitor {top_sensors[0]['sensor']} closely."
 
+def new_scheduler(n_features):
+    """Create an adaptive scoring scheduler from the global config"""
+    return AdaptiveScheduler(
+        n_features=n_features,
+        max_interval=ADAPTIVE_MAX_INTERVAL,
+        z_threshold=ADAPTIVE_Z_THRESHOLD,
+        ewma_alpha=ADAPTIVE_EWMA_ALPHA,
+        ewma_limit=ADAPTIVE_EWMA_LIMIT,
+    )
+
+def new_plant_threshold(model_key):
+    """Create a streaming plant threshold from the global config"""
+    return PlantThreshold(
+        model_key,
+        percentile=PLANT_THRESHOLD_PERCENTILE,
+        decay=PLANT_THRESHOLD_DECAY,
+        warmup=PLANT_THRESHOLD_WARMUP,
+        min_factor=PLANT_THRESHOLD_BOUNDS[0],
+        max_factor=PLANT_THRESHOLD_BOUNDS[1],
+    )
+
 # ---------------- Ingest Endpoint ----------------
 
 @app.post("/ingest")
@@ -245,42 +372,87 @@ async def ingest(row: SensorRow):
     """Real-time ingestion and prediction endpoint"""
     try:
         plant = row.plant_id
+        bundle = await registry.get_async(plant)
         
-        # Initialize buffers if new plant
-        if plant not in buffers:
-            buffers[plant] = deque(maxlen=SEQUENCE_BUFFER)
-            anomaly_history[plant] = deque(maxlen=ROLLING_WINDOW)
+        # Resident, reloaded or new plant state (rejects unknown plants when restricted)
+        state = plants.get(plant)
+        if state.buffer.maxlen < bundle.seq_len:
+            # Swapped to a model with a longer sequence: grow without dropping rows
+            state.buffer = deque(state.buffer, maxlen=bundle.seq_len)
         
-        # Preprocess and add to buffer
-        row_scaled = preprocess_row(row.values)
-        buffers[plant].append(row_scaled)
+        # Preprocess and add raw row to buffer
+        row_raw = preprocess_row(row.values, bundle)
+        state.buffer.append(row_raw)
+        row_scaled = scale_rows(row_raw, bundle)[0]
         
         # Store latest raw values for health check
-        latest_sensor_values[plant] = {
+        state.latest_values = {
             "timestamp": row.timestamp,
             "values": row.values
         }
         
         # Build sequence (with padding if needed)
-        seq = sequence_from_buffer(buffers[plant])
+        seq = sequence_from_buffer(state.buffer, bundle)
+        
+        # Errors are model-specific: after a swap (or a reload into another model)
+        # restart calibration and force a fresh run instead of reusing old errors
+        if state.threshold is None or state.threshold.model != bundle.key:
+            state.threshold = new_plant_threshold(bundle.key)
+            state.scheduler = None
+            state.last_errors = None
+        
+        # Decide whether this row needs a full autoencoder pass
+        if ADAPTIVE_SCORING:
+            if state.scheduler is None:
+                state.scheduler = new_scheduler(len(bundle.columns))
+            run_model, scoring_reason = state.scheduler.should_run(row_scaled)
+        else:
+            run_model, scoring_reason = True, "always"
         
-        # Compute reconstruction error
-        raw_err, feature_err = compute_reconstruction_error(seq)
-        raw_score = raw_err / THRESHOLD
+        shadow = await registry.shadow_for_async(plant) if run_model else None
+        if run_model:
+            # Compute reconstruction error (and the shadow candidate's, if any)
+            if shadow is not None:
+                (raw_err, feature_err, err_map), (shadow_err, _, _) = await asyncio.gather(
+                    compute_reconstruction_error(seq, bundle),
+                    compute_reconstruction_error(sequence_from_buffer(state.buffer, shadow), shadow),
+                )
+                registry.record_shadow(plant, raw_err / bundle.threshold, shadow_err / shadow.threshold)
+            else:
+                raw_err, feature_err, err_map = await compute_reconstruction_error(seq, bundle)
+            state.last_errors = (raw_err, feature_err)
+            state.explanation.record(bundle.key, bundle.columns, row.timestamp, err_map, feature_err)
+        else:
+            # Quiet plant: reuse the last model output
+            raw_err, feature_err = state.last_errors
+        threshold = state.threshold.effective(bundle.threshold, THRESHOLD_MODE)
+        raw_score = raw_err / threshold
         
-        # Update anomaly history
-        anomaly_history[plant].append(raw_score)
+        # Update anomaly history and plant threshold with fresh model scores only
+        if run_model:
+            state.history.append(raw_score)
+            # Calibrate against fixed references, never the threshold in force (that
+            # truncates the sample and walks the estimate down to the floor): skip rows
+            # during an open alert and winsorize the rest at the upper clamp
+            if state.alert_tracker.active is None:
+                state.threshold.update(raw_err, bundle.threshold)
         
         # Normalized score for UI (capped at 1.0)
         normalized_score = min(raw_score, 1.0)
         
         # Rolling statistics
-        rolling_avg, rolling_std = compute_rolling_stats(anomaly_history[plant])
+        rolling_avg, rolling_std = compute_rolling_stats(state.history)
         stability = calculate_stability_score(rolling_std)
-        confidence = calculate_confidence(rolling_std, len(anomaly_history[plant]))
+        confidence = calculate_confidence(rolling_std, len(state.history))
         
         # Determine severity
         severity = calculate_severity(raw_score, rolling_avg)
+        if run_model and ADAPTIVE_SCORING:
+            onset = state.explanation.onset_rows_ago(EXPLAIN_ONSET_Z) if severity != "normal" else None
+            state.scheduler.record_result(severity, scoring_reason, onset)
+        
+        # Energy and CO2 running totals (excess energy while severity is not normal)
+        state.energy.update(row.timestamp, row.values, severity)
         
         # Generate AI analysis based on severity
         if severity == "normal":
@@ -288,18 +460,20 @@ async def ingest(row: SensorRow):
             root_cause = "No anomaly detected"
             recommendation = "System operating normally"
         else:
-            top_sensors = get_top_contributing_sensors(feature_err, top_k=3)
+            top_sensors = get_top_contributing_sensors(feature_err, bundle.columns, top_k=3)
             root_cause = determine_root_cause(top_sensors)
             recommendation = generate_recommendation(severity, top_sensors, root_cause)
         
         # Build response
-        is_complete = len(buffers[plant]) >= SEQ_LEN
+        is_complete = len(state.buffer) >= bundle.seq_len
         analytics = {
             "plant_id": plant,
             "timestamp": row.timestamp,
+            "model": bundle.key,
             "severity": severity,
             "anomaly_score": round(normalized_score, 4),
             "raw_anomaly_score": round(raw_score, 4),
+            "threshold": round(threshold, 6),
             "confidence": round(confidence * 100, 2),
             "stability": round(stability, 2),
             "rolling_avg": round(rolling_avg, 4),
@@ -310,21 +484,40 @@ async def ingest(row: SensorRow):
             ],
             "root_cause": root_cause,
             "recommendation": recommendation,
-            "buffer_len": len(buffers[plant]),
-            "history_len": len(anomaly_history[plant]),
+            "buffer_len": len(state.buffer),
+            "history_len": len(state.history),
             "sequence_complete": is_complete,
-            "buffer_filled": is_complete # Flutter compatibility
+            "buffer_filled": is_complete, # Flutter compatibility
+            "inference": "run" if run_model else "skipped",
+            "scoring_reason": scoring_reason
         }
         
-        # Store in global state
-        latest_predictions[plant] = analytics
+        # Debounce severity into alert transitions
+        alert_events = alerts.update(state.alert_tracker, severity, row.timestamp, analytics)
+        active_alert = state.alert_tracker.active
+        analytics["alert"] = (
+            {"id": active_alert.id, "state": active_alert.state} if active_alert else None
+        )
         
-        # Broadcast to WebSocket clients
+        # Store in plant state
+        state.latest_prediction = analytics
+        plants.touch(state)
+        
+        # Broadcast alert transitions to every client, raw predictions only to subscribers
+        for event in alert_events:
+            asyncio.create_task(manager.broadcast(event, "alerts"))
         event = {"type": "prediction", **analytics}
-        asyncio.create_task(manager.broadcast(event))
+        asyncio.create_task(manager.broadcast(event, "predictions"))
         
         return {"received": True, **analytics}
     
+    except PlantNotAllowed as e:
+        return {
+            "received": False,
+            "error": str(e),
+            "plant_id": row.plant_id,
+            "timestamp": row.timestamp
+        }
     except Exception as e:
         print(f"Ingest error: {e}")
         return {
@@ -337,15 +530,18 @@ async def ingest(row: SensorRow):
 # ---------------- WebSocket Endpoint ----------------
 
 @app.websocket("/ws")
-async def websocket_endpoint(ws: WebSocket):
-    """WebSocket endpoint for real-time updates"""
-    await manager.connect(ws)
+async def websocket_endpoint(ws: WebSocket, stream: str = WS_DEFAULT_STREAM):
+    """WebSocket endpoint for real-time updates (?stream=alerts|predictions)"""
+    if stream not in ("alerts", "predictions"):
+        stream = WS_DEFAULT_STREAM
+    await manager.connect(ws, stream)
     try:
         # Send initial connection confirmation
         await ws.send_json({
             "type": "connection",
             "status": "connected",
-            "message": "Real-time predictions active"
+            "stream": stream,
+            "message": f"Real-time {stream} active"
         })
         
         # Keep connection alive
@@ -358,30 +554,63 @@ async def websocket_endpoint(ws: WebSocket):
         print(f"WebSocket error: {e}")
         manager.disconnect(ws)
 
+# ---------------- Alerts ----------------
+
+@app.get("/alerts")
+def list_alerts(plant_id: Optional[str] = None, state: Optional[str] = None, limit: int = 100):
+    """Alert history, most recent first"""
+    return {"alerts": alerts.query(plant_id, state, limit)}
+
+@app.get("/alerts/stats")
+def alert_stats():
+    """Alert volume compared to scored rows and websocket messages sent"""
+    return {**alerts.stats(), "websocket_messages": manager.sent}
+
+@app.get("/alerts/{alert_id}")
+def get_alert(alert_id: str):
+    alert = alerts.by_id.get(alert_id)
+    if alert is None:
+        return {"found": False, "id": alert_id}
+    return {"found": True, **alert.to_dict()}
+
+@app.post("/alerts/{alert_id}/ack")
+async def acknowledge_alert(alert_id: str, body: AlertAck = AlertAck()):
+    """Acknowledge an open alert and notify websocket clients"""
+    event = alerts.acknowledge(alert_id, by=body.by, timestamp=body.timestamp)
+    if event is None:
+        return {"acknowledged": False, "id": alert_id}
+    await manager.broadcast(event, "alerts")
+    return {"acknowledged": True, **event["alert"]}
+
 # ---------------- Health Check ----------------
 
 @app.get("/health")
 def health():
     """Health check endpoint with latest predictions"""
+    bundle = registry.get_model(registry.default)
     return {
         "status": "ok",
         "model_loaded": True,
-        "seq_len": SEQ_LEN,
+        "default_model": bundle.key,
+        "seq_len": bundle.seq_len,
         "sequence_buffer": SEQUENCE_BUFFER,
-        "threshold": THRESHOLD,
-        "columns": COLUMNS,
-        "num_features": len(COLUMNS),
+        "threshold": bundle.threshold,
+        "columns": bundle.columns,
+        "num_features": len(bundle.columns),
         "mode": "real-time",
-        "latest_predictions": latest_predictions,
-        "latest_sensor_values": latest_sensor_values
+        "adaptive_scoring": ADAPTIVE_SCORING,
+        "latest_predictions": {p: s.latest_prediction for p, s in plants.states.items()},
+        "latest_sensor_values": {p: s.latest_values for p, s in plants.states.items()},
+        "plant_state": plants.metrics()
     }
 
 # ---------------- Status Endpoint ----------------
 
 @app.get("/status/{plant_id}")
-def status(plant_id: str = "plant_1"):
+async def status(plant_id: str = "plant_1"):
     """Get current status for a plant"""
-    if plant_id not in buffers:
+    state = find_plant_state(plant_id)
+    if state is None:
         return {
             "plant_id": plant_id,
             "status": "no_data",
@@ -389,14 +618,135 @@ def status(plant_id: str = "plant_1"):
             "history_len": 0
         }
     
+    bundle = await registry.get_async(plant_id)
     return {
         "plant_id": plant_id,
         "status": "active",
-        "buffer_len": len(buffers[plant_id]),
-        "history_len": len(anomaly_history[plant_id]),
-        "sequence_complete": len(buffers[plant_id]) >= SEQ_LEN,
+        "model": bundle.key,
+        "buffer_len": len(state.buffer),
+        "history_len": len(state.history),
+        "sequence_complete": len(state.buffer) >= bundle.seq_len,
+        "threshold": (
+            state.threshold.describe(bundle.threshold, THRESHOLD_MODE)
+            if state.threshold is not None else None
+        ),
+        "state_bytes": state.nbytes,
         "active_websockets": len(manager.active)
     }
 
+# ---------------- Explainability ----------------
+
+@app.get("/explain/{plant_id}")
+async def explain(plant_id: str, top_k: int = 5, include_map: bool = False):
+    """Per-sensor attribution, anomaly onset and contribution trend of the latest model run"""
+    state = find_plant_state(plant_id)
+    report = state.explanation.explain(top_k, EXPLAIN_ONSET_Z, include_map) if state else None
+    if report is None:
+        return {"plant_id": plant_id, "status": "no_data"}
+    return {"plant_id": plant_id, "status": "active", **report}
+
+# ---------------- Energy Reports ----------------
+
+@app.get("/reports/energy/{plant_id}")
+async def energy_report(plant_id: str, day: Optional[str] = None):
+    """Energy intensity and CO2 KPIs for a plant, a day (YYYY-MM-DD, default: latest) and its shifts"""
+    state = find_plant_state(plant_id)
+    if state is None:
+        return {"plant_id": plant_id, "status": "no_data"}
+    return {"plant_id": plant_id, "status": "active", **state.energy.report(day)}
+
+# ---------------- Adaptive Scoring Stats ----------------
+
+@app.get("/scoring/stats")
+def scoring_stats():
+    """Skip ratio and detection-latency impact of adaptive scoring (resident plants)"""
+    plant_ids = [p for p, s in plants.states.items() if s.scheduler is not None]
+    schedulers = [plants.states[p].scheduler for p in plant_ids]
+    return {
+        "adaptive_scoring": ADAPTIVE_SCORING,
+        "max_interval": ADAPTIVE_MAX_INTERVAL,
+        "z_threshold": ADAPTIVE_Z_THRESHOLD,
+        "fleet": summarize_stats(schedulers),
+        "plants": {p: s.stats() for p, s in zip(plant_ids, schedulers)}
+    }
+
+# ---------------- Plant State ----------------
+
+@app.get("/plants/metrics")
+def plant_metrics():
+    """Resident plants, bytes per plant, evictions and reloads"""
+    return plants.metrics()
+
+@app.post("/plants/{plant_id}", dependencies=[Depends(require_admin)])
+async def register_plant(plant_id: str):
+    """Register a plant (required when REQUIRE_REGISTRATION is on)"""
+    try:
+        plants.register(plant_id)
+    except PlantNotAllowed as e:
+        return {"registered": False, "plant_id": plant_id, "error": str(e)}
+    return {"registered": True, "plant_id": plant_id}
+
+@app.delete("/plants/{plant_id}", dependencies=[Depends(require_admin)])
+async def unregister_plant(plant_id: str):
+    """Unregister a plant and drop its resident and spilled state"""
+    plants.unregister(plant_id)
+    return {"registered": False, "plant_id": plant_id}
+
+async def evict_idle_plants():
+    while True:
+        await asyncio.sleep(EVICTION_INTERVAL)
+        evicted = plants.evict_idle()
+        if evicted:
+            print(f"Evicted {evicted} idle plant(s)")
+
+@app.on_event("startup")
+async def start_eviction():
+    asyncio.create_task(evict_idle_plants())
+
+@app.on_event("shutdown")
+def persist_state():
+    # Thresholds, buffers and open alerts survive a restart via the spill directory
+    plants.spill_all()
+
+# ---------------- Model Admin ----------------
+
+@app.get("/admin/models", dependencies=[Depends(require_admin)])
+def list_models():
+    """Registry contents, loaded versions, batching and shadow statistics"""
+    return registry.describe()
+
+@app.post("/admin/models/{name}/swap", dependencies=[Depends(require_admin)])
+async def swap_model(name: str, body: ModelVersion):
+    """Load a model version off the event loop, then atomically activate it"""
+    try:
+        previous = await asyncio.to_thread(registry.swap, name, body.version, body.path)
+    except Exception as e:
+        return {"swapped": False, "model": name, "error": str(e)}
+    return {"swapped": True, "model": name, "version": body.version, "previous": previous}
+
+@app.post("/admin/models/{name}/shadow", dependencies=[Depends(require_admin)])
+async def shadow_model(name: str, body: ModelVersion):
+    """Score a candidate version alongside the active one"""
+    try:
+        await asyncio.to_thread(registry.set_shadow, name, body.version, body.path)
+    except Exception as e:
+        return {"shadowing": False, "model": name, "error": str(e)}
+    return {"shadowing": True, "model": name, "version": body.version}
+
+@app.delete("/admin/models/{name}/shadow", dependencies=[Depends(require_admin)])
+def stop_shadow(name: str):
+    """Stop shadow scoring and return the final comparison"""
+    stats = registry.clear_shadow(name)
+    return {"shadowing": False, "model": name, "stats": stats.stats() if stats else None}
+
+@app.post("/admin/plants/{plant_id}/model", dependencies=[Depends(require_admin)])
+def assign_model(plant_id: str, body: PlantModel):
+    """Route a plant to a named model"""
+    try:
+        registry.assign(plant_id, body.model)
+    except KeyError as e:
+        return {"assigned": False, "plant_id": plant_id, "error": str(e)}
+    return {"assigned": True, "plant_id": plant_id, "model": body.model}
+
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
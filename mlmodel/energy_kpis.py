@@ -0,0 +1,202 @@
+# energy_kpis.py
+# Incremental energy-intensity and CO2 KPIs per plant, shift and day.
+#
+# Every ingested row adds its share of fuel, feed, motor energy and CO2 to
+# running totals, so reports are read from precomputed aggregates instead of
+# rescanning raw data. Excess energy is the fuel burned above the plant's
+# normal-operation intensity (fuel per ton of feed) while severity is not
+# normal.
+
+import math
+from datetime import datetime, timedelta
+
+# ---------------- Conversion Factors ----------------
+
+FUEL_LHV_MJ_PER_KG = 27.0          # Lower heating value of kiln coal
+FUEL_CO2_KG_PER_KG = 2.6           # Combustion CO2 per kg of fuel
+CALCINATION_CO2_KG_PER_TON = 340.0  # Process CO2 per ton of raw meal feed
+GRID_CO2_KG_PER_KWH = 0.7          # Emission factor of purchased electricity
+MOTOR_VOLTAGE = 6600.0             # Kiln drive supply voltage (V, three phase)
+MOTOR_POWER_FACTOR = 0.85
+
+# Rows further apart than this (outage, restart) count as MAX_ROW_GAP seconds
+MAX_ROW_GAP = 60.0
+# Interval assumed for the first row of a plant
+DEFAULT_ROW_INTERVAL = 1.0
+
+
+def parse_timestamp(value, previous=None):
+    """ISO timestamp of a row.
+
+    Unparseable values continue the plant's data clock (previous row plus
+    DEFAULT_ROW_INTERVAL) so buckets stay keyed by data time; the arrival
+    time is only used for a plant's first row.
+    """
+    try:
+        return datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        if previous is not None:
+            return previous + timedelta(seconds=DEFAULT_ROW_INTERVAL)
+        return datetime.now()
+
+
+def motor_kw(current):
+    """Three-phase electrical power of the kiln drive"""
+    return math.sqrt(3) * MOTOR_VOLTAGE * current * MOTOR_POWER_FACTOR / 1000.0
+
+
+class EnergyTotals:
+    """Running sums for one aggregation bucket"""
+
+    __slots__ = ("rows", "seconds", "fuel_kg", "feed_t", "motor_kwh", "co2_kg",
+                 "co2_pct_seconds", "anomalous_seconds", "excess_fuel_kg", "excess_co2_kg")
+
+    def __init__(self):
+        for name in self.__slots__:
+            setattr(self, name, 0.0)
+
+    def add(self, seconds, fuel_kg, feed_t, motor_kwh, co2_kg, co2_pct, excess_fuel_kg, anomalous):
+        self.rows += 1
+        self.seconds += seconds
+        self.fuel_kg += fuel_kg
+        self.feed_t += feed_t
+        self.motor_kwh += motor_kwh
+        self.co2_kg += co2_kg
+        self.co2_pct_seconds += co2_pct * seconds
+        if anomalous:
+            self.anomalous_seconds += seconds
+            self.excess_fuel_kg += excess_fuel_kg
+            self.excess_co2_kg += excess_fuel_kg * FUEL_CO2_KG_PER_KG
+
+    def to_dict(self):
+        feed = self.feed_t
+        per_ton = lambda x: round(x / feed, 4) if feed > 0 else None
+        return {
+            "rows": int(self.rows),
+            "hours": round(self.seconds / 3600, 3),
+            "fuel_kg": round(self.fuel_kg, 2),
+            "feed_t": round(self.feed_t, 3),
+            "thermal_gj": round(self.fuel_kg * FUEL_LHV_MJ_PER_KG / 1000, 3),
+            "motor_kwh": round(self.motor_kwh, 2),
+            "co2_kg": round(self.co2_kg, 2),
+            "fuel_kg_per_t": per_ton(self.fuel_kg),
+            "thermal_mj_per_t": per_ton(self.fuel_kg * FUEL_LHV_MJ_PER_KG),
+            "motor_kwh_per_t": per_ton(self.motor_kwh),
+            "co2_kg_per_t": per_ton(self.co2_kg),
+            "mean_exhaust_co2_pct": (
+                round(self.co2_pct_seconds / self.seconds, 3) if self.seconds else None
+            ),
+            "anomalous_hours": round(self.anomalous_seconds / 3600, 3),
+            "excess_fuel_kg": round(self.excess_fuel_kg, 2),
+            "excess_energy_gj": round(self.excess_fuel_kg * FUEL_LHV_MJ_PER_KG / 1000, 3),
+            "excess_co2_kg": round(self.excess_co2_kg, 2),
+        }
+
+
+class PlantEnergy:
+    """Lifetime, per-day and per-shift energy totals of one plant.
+
+    Day and shift buckets are keyed by the rows' own timestamps and only the
+    last retention_days days are kept, so memory per plant is bounded.
+    """
+
+    def __init__(self, shift_hours=8, retention_days=31):
+        self.shift_hours = shift_hours
+        self.retention_days = retention_days
+        self.total = EnergyTotals()
+        self.normal = EnergyTotals()   # Baseline intensity: normal rows only
+        self.days = {}                 # "YYYY-MM-DD" -> EnergyTotals
+        self.shifts = {}               # "YYYY-MM-DD/S" -> EnergyTotals
+        self.last_ts = None
+        self.day_key = None
+        self.shift_key = None
+
+    def _bucket(self, buckets, key, limit):
+        totals = buckets.get(key)
+        if totals is None:
+            totals = buckets[key] = EnergyTotals()
+            # Keys sort chronologically: drop the oldest day/shift, not the first inserted,
+            # so a late row for an old day cannot evict a newer one
+            while len(buckets) > limit:
+                del buckets[min(buckets)]
+        return totals
+
+    def baseline_fuel_per_t(self):
+        """Fuel per ton of feed during normal operation so far"""
+        if self.normal.feed_t <= 0:
+            return None
+        return self.normal.fuel_kg / self.normal.feed_t
+
+    def update(self, timestamp, values, severity):
+        """Add one row; values are rates (fuel kg/h, feed t/h, motor A, exhaust CO2 %)"""
+        ts = parse_timestamp(timestamp, self.last_ts)
+        try:
+            delta = (ts - self.last_ts).total_seconds()
+        except TypeError:
+            # First row, or mixed naive/aware timestamps
+            delta = DEFAULT_ROW_INTERVAL
+        # Late (out-of-order) rows count one nominal interval and do not move the clock back
+        seconds = min(delta, MAX_ROW_GAP) if delta >= 0 else DEFAULT_ROW_INTERVAL
+        latest = delta >= 0
+        if latest:
+            self.last_ts = ts
+        hours = seconds / 3600
+
+        fuel_kg = max(values.get("fuel_flow_rate", 0.0), 0.0) * hours
+        feed_t = max(values.get("feed_rate", 0.0), 0.0) * hours
+        motor_kwh = motor_kw(max(values.get("motor_current", 0.0), 0.0)) * hours
+        co2_kg = (fuel_kg * FUEL_CO2_KG_PER_KG
+                  + feed_t * CALCINATION_CO2_KG_PER_TON
+                  + motor_kwh * GRID_CO2_KG_PER_KWH)
+        co2_pct = values.get("exhaust_co2", 0.0)
+
+        anomalous = severity != "normal"
+        excess_fuel_kg = 0.0
+        if anomalous:
+            baseline = self.baseline_fuel_per_t()
+            if baseline is not None:
+                excess_fuel_kg = max(fuel_kg - baseline * feed_t, 0.0)
+        else:
+            self.normal.add(seconds, fuel_kg, feed_t, motor_kwh, co2_kg, co2_pct, 0.0, False)
+
+        day_key = ts.strftime("%Y-%m-%d")
+        shift_key = f"{day_key}/{ts.hour // self.shift_hours + 1}"
+        if latest:
+            self.day_key, self.shift_key = day_key, shift_key
+        shifts_per_day = math.ceil(24 / self.shift_hours)
+        buckets = (
+            self.total,
+            self._bucket(self.days, day_key, self.retention_days),
+            self._bucket(self.shifts, shift_key, self.retention_days * shifts_per_day),
+        )
+        for totals in buckets:
+            totals.add(seconds, fuel_kg, feed_t, motor_kwh, co2_kg, co2_pct, excess_fuel_kg, anomalous)
+
+    @property
+    def nbytes(self):
+        # ~250 bytes per bucket object plus its key
+        return 250 * (len(self.days) + len(self.shifts) + 2)
+
+    def report(self, day=None):
+        """Totals for the plant, one day (default: current) and its shifts"""
+        day = day or self.day_key
+        totals = self.days.get(day)
+        shifts_per_day = math.ceil(24 / self.shift_hours)
+        shifts = {}
+        for s in range(1, shifts_per_day + 1):
+            bucket = self.shifts.get(f"{day}/{s}")
+            if bucket is not None:
+                shifts[str(s)] = bucket.to_dict()
+
+        baseline = self.baseline_fuel_per_t()
+        return {
+            "last_timestamp": self.last_ts.isoformat() if self.last_ts else None,
+            "current_shift": self.shift_key,
+            "shift_hours": self.shift_hours,
+            "baseline_fuel_kg_per_t": round(baseline, 4) if baseline is not None else None,
+            "total": self.total.to_dict(),
+            "day": day,
+            "day_totals": totals.to_dict() if totals is not None else None,
+            "shifts": shifts,
+            "days_available": sorted(self.days),
+        }
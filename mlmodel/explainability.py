@@ -0,0 +1,160 @@
+# explainability.py
+# Per-sensor attribution from the reconstruction the scorer already computed:
+# per-timestep x per-sensor error maps, onset detection inside the window and
+# contribution trends over the last N model runs. Nothing here calls the model.
+
+from collections import deque
+
+import numpy as np
+
+# Rows at the start of the window treated as the pre-anomaly baseline
+BASELINE_FRACTION = 0.5
+# Scale MAD to a standard deviation for normally distributed errors
+MAD_SCALE = 1.4826
+
+
+def contribution_shares(feature_errors):
+    """Fraction of the total window error due to each sensor"""
+    total = float(np.sum(feature_errors))
+    if total <= 0:
+        return np.zeros(len(feature_errors), dtype=np.float16)
+    return (np.asarray(feature_errors) / total).astype(np.float16)
+
+
+def trailing_run(above):
+    """Length of the run of True values ending at the last row, per column"""
+    return np.cumprod(above[::-1], axis=0).sum(axis=0)
+
+
+def detect_onset(errors, z=3.0, baseline_fraction=BASELINE_FRACTION):
+    """Rows since errors rose above the window's own baseline.
+
+    errors is (seq_len,) or (seq_len, n_sensors). A row deviates when its error
+    exceeds median + z * MAD of the first baseline_fraction of the window; the
+    onset is the start of the deviating run that ends at the latest row.
+    Returns the run length (0 = no deviation at the latest row), per column
+    for 2-D input.
+    """
+    errors = np.asarray(errors, dtype=np.float32)
+    n_base = max(int(len(errors) * baseline_fraction), 2)
+    base = errors[:n_base]
+    median = np.median(base, axis=0)
+    mad = np.median(np.abs(base - median), axis=0) * MAD_SCALE
+    # Floor the spread so a perfectly reconstructed baseline does not flag noise
+    spread = np.maximum(mad, 0.05 * median + 1e-6)
+    return trailing_run(errors > median + z * spread)
+
+
+class PlantExplanation:
+    """Latest error map and contribution history of one plant"""
+
+    def __init__(self, trend_len=100):
+        self.model = None
+        self.columns = []
+        self.timestamp = None
+        self.error_map = None                   # float16 (seq_len, n_sensors)
+        self.trend = deque(maxlen=trend_len)    # (timestamp, float16 shares)
+
+    def record(self, model_key, columns, timestamp, err_map, feature_errors):
+        """Keep the map of a model run; shares are only comparable within one model"""
+        if model_key != self.model:
+            self.trend.clear()
+            self.model = model_key
+            self.columns = list(columns)
+        self.timestamp = timestamp
+        self.error_map = err_map
+        self.trend.append((timestamp, contribution_shares(feature_errors)))
+
+    @property
+    def nbytes(self):
+        size = self.error_map.nbytes if self.error_map is not None else 0
+        if self.trend:
+            size += len(self.trend) * (self.trend[-1][1].nbytes + 160)
+        return size
+
+    def trend_summary(self):
+        """Mean share and per-prediction slope of each sensor's contribution"""
+        columns = self.columns
+        n = len(self.trend)
+        if n == 0:
+            return {"predictions": 0, "sensors": {}, "rising": []}
+        shares = np.array([s for _, s in self.trend], dtype=np.float32)
+        mean = shares.mean(axis=0)
+        if n >= 3:
+            slope = np.polyfit(np.arange(n), shares, 1)[0]
+        else:
+            slope = np.zeros(shares.shape[1], dtype=np.float32)
+
+        rising = np.argsort(slope)[::-1]
+        return {
+            "predictions": n,
+            "since": self.trend[0][0],
+            "sensors": {
+                columns[i]: {
+                    "mean_share": round(float(mean[i]), 4),
+                    "latest_share": round(float(shares[-1, i]), 4),
+                    "slope": round(float(slope[i]), 6),
+                }
+                for i in range(len(columns))
+            },
+            "rising": [columns[i] for i in rising[:3] if slope[i] > 0],
+        }
+
+    def onset_rows_ago(self, onset_z=3.0):
+        """Rows since the deviation in the latest map started (None if none at the latest row)"""
+        if self.error_map is None:
+            return None
+        run = int(detect_onset(self.error_map.astype(np.float32).mean(axis=1), onset_z))
+        return run - 1 if run else None
+
+    def explain(self, top_k=5, onset_z=3.0, include_map=False):
+        """Attribution report for the latest model run of the plant"""
+        if self.error_map is None:
+            return None
+        columns = self.columns
+
+        err = self.error_map.astype(np.float32)
+        seq_len = len(err)
+        row_err = err.mean(axis=1)
+
+        run = int(detect_onset(row_err, onset_z))
+        sensor_runs = detect_onset(err, onset_z)
+
+        # Rank by error since the onset (or over the last rows) rather than the
+        # whole window, which is dominated by older, normal timesteps
+        recent = max(run, 1)
+        recent_err = err[-recent:].mean(axis=0)
+        window_err = err.mean(axis=0)
+        total = float(recent_err.sum()) or 1.0
+
+        sensors = []
+        for i in np.argsort(recent_err)[::-1][:top_k]:
+            sensor_run = int(sensor_runs[i])
+            sensors.append({
+                "sensor": columns[i],
+                "recent_error": round(float(recent_err[i]), 4),
+                "window_error": round(float(window_err[i]), 4),
+                "share": round(float(recent_err[i]) / total, 4),
+                "onset_rows_ago": sensor_run - 1 if sensor_run else None,
+                "before_window": sensor_run == seq_len,
+            })
+
+        report = {
+            "model": self.model,
+            "timestamp": self.timestamp,
+            "seq_len": seq_len,
+            "onset": {
+                "index": seq_len - run,
+                "rows_ago": run - 1,
+                "before_window": run == seq_len,
+            } if run else None,
+            "sensors": sensors,
+            "timestep_error": [round(float(e), 4) for e in row_err],
+            "trend": self.trend_summary(),
+        }
+        if include_map:
+            report["error_map"] = {
+                "columns": columns,
+                "rows": np.round(err, 4).tolist(),
+            }
+        return report
@@ -0,0 +1,247 @@
+# kiln_generator.py
+# Usage: python kiln_generator.py --rows 1000000 --plants 10 --anomaly_rate 0.01 --out kiln_10m.parquet
+#
+# Vectorized synthetic kiln dataset generator. Anomaly bursts are injected
+# with mask/scatter operations instead of per-row Python loops, output is
+# streamed in chunks to CSV or Parquet, and every row carries ground-truth
+# labels (is_anomaly, failure_type).
+
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+# Normal operating point per sensor: (mean, std)
+SENSORS = {
+    "kiln_temperature": (1450, 8),       # °C
+    "secondary_air_temp": (900, 6),
+    "kiln_pressure": (1.2, 0.05),        # bar
+    "rotary_speed_rpm": (3.5, 0.1),      # rpm
+    "fuel_flow_rate": (250, 5),          # kg/hr
+    "primary_airflow": (50, 2),          # m3/s
+    "secondary_airflow": (70, 3),
+    "motor_current": (180, 4),           # amps
+    "vibration_level": (2.5, 0.2),       # mm/s
+    "exhaust_o2": (4, 0.2),              # %
+    "exhaust_co": (0.18, 0.05),          # %
+    "exhaust_co2": (26, 0.4),            # %
+    "feed_rate": (200, 4),               # tons/hr
+    "kiln_torque": (420, 10),            # kN
+    "preheater_temp": (780, 10),         # °C
+    "clinker_temp": (1250, 7),
+}
+
+# Failure type -> {sensor: (low, high)} offset drawn uniformly per row
+FAILURE_TYPES = {
+    "overheat_spike": {
+        "kiln_temperature": (40, 80),
+        "kiln_pressure": (0.3, 0.7),
+        "motor_current": (10, 20),
+    },
+    "airflow_failure": {
+        "primary_airflow": (-20, -10),
+        "secondary_airflow": (-25, -12),
+        "exhaust_o2": (1, 2),
+    },
+    "fuel_pressure_spike": {
+        "fuel_flow_rate": (40, 80),
+        "kiln_temperature": (20, 40),
+        "exhaust_co": (0.3, 0.6),
+    },
+    "vibration_shock": {
+        "vibration_level": (4, 8),
+        "kiln_torque": (30, 50),
+        "motor_current": (15, 25),
+    },
+    "exhaust_gas_leak": {
+        "exhaust_co2": (3, 6),
+        "exhaust_co": (0.4, 0.8),
+        "secondary_air_temp": (15, 30),
+    },
+    # Point fault touching many sensors at once (dataset.py)
+    "combined_fault": {
+        "kiln_temperature": (20, 40),
+        "secondary_airflow": (-10, 15),
+        "primary_airflow": (-5, 8),
+        "fuel_flow_rate": (20, 40),
+        "kiln_pressure": (0.2, 0.5),
+        "vibration_level": (2, 5),
+        "exhaust_co2": (2, 4),
+        "exhaust_co": (0.2, 0.4),
+    },
+}
+
+DEFAULT_FAILURES = [
+    "overheat_spike",
+    "airflow_failure",
+    "fuel_pressure_spike",
+    "vibration_shock",
+    "exhaust_gas_leak",
+]
+NO_FAILURE = -1
+
+
+def plan_bursts(rng, rows, anomaly_rate, burst_len, failures):
+    """Draw burst start rows, lengths and failure types for one plant"""
+    n_bursts = int(rows * anomaly_rate)
+    if n_bursts == 0:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, empty
+    span = max(rows - burst_len[1], 1)
+    starts = np.sort(rng.choice(span, size=min(n_bursts, span), replace=False))
+    lengths = rng.integers(burst_len[0], burst_len[1] + 1, size=len(starts))
+    types = rng.integers(0, len(failures), size=len(starts))
+    return starts, lengths, types
+
+
+def burst_rows(starts, lengths, types, lo, hi):
+    """Expand bursts overlapping [lo, hi) into (row, type) pairs, chunk-local"""
+    # Starts are sorted; a burst reaching into the chunk began < max length before it
+    max_len = int(lengths.max()) if len(lengths) else 0
+    first = np.searchsorted(starts, lo - max_len, side="left")
+    last = np.searchsorted(starts, hi, side="left")
+    starts, lengths, types = starts[first:last], lengths[first:last], types[first:last]
+    if len(starts) == 0:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty
+
+    # Row offsets 0..length-1 of every burst, without a Python loop
+    offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    rows = np.repeat(starts, lengths) + offsets
+    row_types = np.repeat(types, lengths)
+    keep = (rows >= lo) & (rows < hi)
+    return rows[keep] - lo, row_types[keep]
+
+
+def generate_chunk(rng, lo, hi, bursts, failures, start, freq, plant_id=None):
+    """Generate rows [lo, hi) of one plant as a DataFrame"""
+    n = hi - lo
+    data = {}
+    if plant_id is not None:
+        data["plant_id"] = np.full(n, plant_id, dtype=object)
+    step = pd.tseries.frequencies.to_offset(freq)
+    data["timestamp"] = pd.date_range(start=pd.Timestamp(start) + lo * step, periods=n, freq=freq)
+    for name, (mean, std) in SENSORS.items():
+        data[name] = rng.normal(mean, std, n)
+
+    # Later bursts overwrite earlier ones where they overlap
+    row_type = np.full(n, NO_FAILURE, dtype=np.int8)
+    rows, types = burst_rows(*bursts, lo, hi)
+    row_type[rows] = types
+
+    for t, failure in enumerate(failures):
+        mask = row_type == t
+        count = int(mask.sum())
+        if count == 0:
+            continue
+        for sensor, (low, high) in FAILURE_TYPES[failure].items():
+            data[sensor][mask] += rng.uniform(low, high, count)
+
+    data["is_anomaly"] = row_type != NO_FAILURE
+    labels = np.array([""] + failures, dtype=object)
+    data["failure_type"] = labels[row_type.astype(np.int64) + 1]
+    return pd.DataFrame(data)
+
+
+def generate(rows=10000, plants=1, anomaly_rate=0.01, burst_len=(3, 10),
+             failures=None, chunk_size=250000, seed=None,
+             start="2024-01-01", freq="s"):
+    """Yield DataFrame chunks covering `rows` rows for each of `plants` plants.
+
+    anomaly_rate is the number of burst starts per row; with burst_len=(1, 1)
+    it is the fraction of anomalous rows. The same seed and chunk_size
+    reproduce the same data; burst placement depends on the seed only.
+    """
+    failures = list(failures or DEFAULT_FAILURES)
+    seed_seq = np.random.SeedSequence(seed)
+
+    for p, plant_seed in enumerate(seed_seq.spawn(plants)):
+        plant_id = f"plant_{p + 1}" if plants > 1 else None
+        burst_seed, value_seed = plant_seed.spawn(2)
+        bursts = plan_bursts(np.random.default_rng(burst_seed), rows, anomaly_rate,
+                             burst_len, failures)
+
+        # Independent stream per chunk
+        n_chunks = -(-rows // chunk_size)
+        chunk_seeds = value_seed.spawn(n_chunks)
+        for c in range(n_chunks):
+            lo, hi = c * chunk_size, min((c + 1) * chunk_size, rows)
+            rng = np.random.default_rng(chunk_seeds[c])
+            yield generate_chunk(rng, lo, hi, bursts, failures, start, freq, plant_id)
+
+
+def generate_frame(**kwargs):
+    """Generate a whole dataset in memory"""
+    return pd.concat(list(generate(**kwargs)), ignore_index=True)
+
+
+def write_dataset(chunks, path, labels=True):
+    """Stream chunks to CSV or Parquet (by extension); returns rows written"""
+    total = 0
+    writer = None
+    parquet = path.endswith(".parquet")
+
+    if os.path.exists(path):
+        os.remove(path)
+
+    try:
+        for df in chunks:
+            if not labels:
+                df = df.drop(columns=["is_anomaly", "failure_type"])
+            if parquet:
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+                table = pa.Table.from_pandas(df, preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(path, table.schema)
+                writer.write_table(table)
+            else:
+                # Fixed precision formats ~30% faster; prefer Parquet at 10M+ rows
+                df.to_csv(path, mode="a", header=total == 0, index=False, float_format="%.6f")
+            total += len(df)
+    finally:
+        if writer is not None:
+            writer.close()
+    return total
+
+
+def main(args):
+    failures = args.failures or DEFAULT_FAILURES
+    unknown = set(failures) - set(FAILURE_TYPES)
+    if unknown:
+        raise SystemExit(f"Unknown failure types: {', '.join(sorted(unknown))}")
+
+    start = time.perf_counter()
+    chunks = generate(
+        rows=args.rows,
+        plants=args.plants,
+        anomaly_rate=args.anomaly_rate,
+        burst_len=(args.min_burst, args.max_burst),
+        failures=failures,
+        chunk_size=args.chunk_size,
+        seed=args.seed,
+        start=args.start,
+    )
+    total = write_dataset(chunks, args.out, labels=not args.no_labels)
+    elapsed = time.perf_counter() - start
+    print(f"Dataset created → {args.out} ({total} rows, {elapsed:.1f}s, "
+          f"{total / max(elapsed, 1e-9):,.0f} rows/s)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate synthetic kiln sensor data with labeled anomalies")
+    parser.add_argument("--rows", type=int, default=10000, help="Rows per plant")
+    parser.add_argument("--plants", type=int, default=1, help="Number of plants")
+    parser.add_argument("--anomaly_rate", type=float, default=0.01, help="Anomaly bursts per row")
+    parser.add_argument("--min_burst", type=int, default=3, help="Minimum burst length (rows)")
+    parser.add_argument("--max_burst", type=int, default=10, help="Maximum burst length (rows)")
+    parser.add_argument("--failures", nargs="+", default=None, help="Failure types to inject")
+    parser.add_argument("--chunk_size", type=int, default=250000, help="Rows generated per chunk")
+    parser.add_argument("--seed", type=int, default=None, help="Random seed")
+    parser.add_argument("--start", default="2024-01-01", help="First timestamp")
+    parser.add_argument("--no_labels", action="store_true", help="Omit is_anomaly/failure_type columns")
+    parser.add_argument("--out", default="synthetic_kiln.csv", help="Output .csv or .parquet path")
+    args = parser.parse_args()
+    main(args)
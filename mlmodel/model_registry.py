@@ -0,0 +1,423 @@
+# model_registry.py
+# Versioned model registry: per-plant model assignment, lazy LRU loading,
+# cross-plant request batching and zero-downtime hot swap.
+#
+# Registry file format (model_registry.json):
+# {
+#   "default": "kiln_v1",
+#   "models": {
+#     "kiln_v1": {"active": "2025-12-02", "versions": {"2025-12-02": "carbonedge_model"}}
+#   },
+#   "plants": {"plant_7": "kiln_v1"},
+#   "groups": {"north": {"model": "kiln_v1", "plants": ["plant_1", "plant_2"]}}
+# }
+
+import asyncio
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import joblib
+import numpy as np
+import tensorflow as tf
+
+
+def load_autoencoder(path):
+    """Load a saved autoencoder, falling back to TFSMLayer on Keras 3"""
+    try:
+        # Try standard loading (works for Keras 2 / Legacy H5)
+        return tf.keras.models.load_model(path)
+    except (ValueError, TypeError):
+        # Fallback for Keras 3 which doesn't support direct SavedModel loading
+        print("Using Keras 3 TFSMLayer fallback...")
+        return AEWrapper(path)
+
+
+class AEWrapper:
+    def __init__(self, path):
+        self.layer = tf.keras.layers.TFSMLayer(path, call_endpoint='serving_default')
+
+    def predict(self, x, verbose=0):
+        # TFSMLayer returns a dict of tensors
+        out = self.layer(x)
+        # Return the first output value converted to numpy
+        return list(out.values())[0].numpy()
+
+
+def dir_size(path):
+    """Total size in bytes of all files below path"""
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            total += os.path.getsize(os.path.join(root, name))
+    return total
+
+
+class BatchPredictor:
+    """Coalesces concurrent predict calls on one model into a single batch"""
+
+    def __init__(self, ae, max_batch=64, max_wait_ms=5):
+        self.ae = ae
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self.pending = []
+        self.flush_handle = None
+
+        # Statistics
+        self.batches = 0
+        self.sequences = 0
+
+    async def predict(self, seq):
+        """Reconstruct one (seq_len, n_features) sequence"""
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        self.pending.append((seq, fut))
+
+        if len(self.pending) >= self.max_batch:
+            self.flush()
+        elif self.flush_handle is None:
+            self.flush_handle = loop.call_later(self.max_wait, self.flush)
+
+        return await fut
+
+    def flush(self):
+        """Run the model on every pending sequence"""
+        if self.flush_handle is not None:
+            self.flush_handle.cancel()
+            self.flush_handle = None
+
+        batch, self.pending = self.pending, []
+        if not batch:
+            return
+
+        try:
+            preds = self.ae.predict(np.stack([seq for seq, _ in batch]), verbose=0)
+        except Exception as e:
+            for _, fut in batch:
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+
+        self.batches += 1
+        self.sequences += len(batch)
+        for i, (_, fut) in enumerate(batch):
+            if not fut.done():
+                fut.set_result(preds[i])
+
+    def stats(self):
+        return {
+            "batches": self.batches,
+            "sequences": self.sequences,
+            "mean_batch_size": round(self.sequences / self.batches, 2) if self.batches else 0.0,
+        }
+
+
+class ModelBundle:
+    """Autoencoder, scaler and metadata of one model version"""
+
+    def __init__(self, name, version, path):
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Model directory not found: {path}")
+
+        print(f"Loading model {name}@{version} from {path}...")
+        self.name = name
+        self.version = version
+        self.path = path
+        self.ae = load_autoencoder(os.path.join(path, 'ae_model'))
+        self.scaler = joblib.load(os.path.join(path, 'scaler.pkl'))
+
+        with open(os.path.join(path, 'meta.json')) as f:
+            self.meta = json.load(f)
+
+        self.columns = self.meta['columns']
+        self.seq_len = self.meta['seq_len']
+        self.threshold = self.meta['threshold']
+        self.size_bytes = dir_size(path)
+        self.batcher = BatchPredictor(self.ae)
+
+    @property
+    def key(self):
+        return f"{self.name}@{self.version}"
+
+    def describe(self):
+        return {
+            "name": self.name,
+            "version": self.version,
+            "path": self.path,
+            "seq_len": self.seq_len,
+            "threshold": self.threshold,
+            "num_features": len(self.columns),
+            "size_bytes": self.size_bytes,
+            "batching": self.batcher.stats(),
+        }
+
+
+class ShadowStats:
+    """Running comparison between an active model and its shadow candidate"""
+
+    def __init__(self, version):
+        self.version = version
+        self.rows = 0
+        self.agree = 0
+        self.abs_diff_total = 0.0
+        self.active_total = 0.0
+        self.shadow_total = 0.0
+
+    def update(self, active_score, shadow_score):
+        self.rows += 1
+        self.agree += int((active_score >= 1.0) == (shadow_score >= 1.0))
+        self.abs_diff_total += abs(active_score - shadow_score)
+        self.active_total += active_score
+        self.shadow_total += shadow_score
+
+    def stats(self):
+        n = max(self.rows, 1)
+        return {
+            "version": self.version,
+            "rows": self.rows,
+            "anomaly_agreement": round(self.agree / n, 4),
+            "mean_abs_score_diff": round(self.abs_diff_total / n, 4),
+            "mean_active_score": round(self.active_total / n, 4),
+            "mean_shadow_score": round(self.shadow_total / n, 4),
+        }
+
+
+class ModelRegistry:
+    """Maps plants to versioned models and keeps an LRU cache of loaded bundles"""
+
+    def __init__(self, config_path, default_dir, max_loaded=4, memory_budget_mb=1024,
+                 models_root='.'):
+        self.config_path = config_path
+        self.models_root = os.path.realpath(models_root)
+        self.max_loaded = max_loaded
+        self.memory_budget = memory_budget_mb * 1024 * 1024
+
+        if os.path.exists(config_path):
+            with open(config_path) as f:
+                config = json.load(f)
+        else:
+            # Single shared model, same as before the registry existed
+            config = {
+                "default": "default",
+                "models": {"default": {"active": "v1", "versions": {"v1": default_dir}}},
+            }
+
+        self.default = config["default"]
+        self.models = config["models"]
+        self.plants = dict(config.get("plants", {}))
+        self.groups = config.get("groups", {})
+        self.shadows = {}
+        self.shadow_stats = {}
+
+        if self.default not in self.models:
+            raise RuntimeError(f"Default model '{self.default}' missing from registry")
+
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._load_locks = {}
+
+    # ---------------- Lookup ----------------
+
+    def model_for(self, plant_id):
+        """Resolve the model name serving a plant (plant > group > default)"""
+        if plant_id in self.plants:
+            return self.plants[plant_id]
+        for group in self.groups.values():
+            if plant_id in group.get("plants", []):
+                return group["model"]
+        return self.default
+
+    def get(self, plant_id):
+        """Active bundle for a plant, loading it lazily"""
+        return self.get_model(self.model_for(plant_id))
+
+    def get_model(self, name):
+        """Active bundle of a named model"""
+        return self.load(name, self.models[name]["active"])
+
+    def shadow_for(self, plant_id):
+        """Shadow candidate bundle for a plant's model, if any"""
+        name = self.model_for(plant_id)
+        version = self.shadows.get(name)
+        return self.load(name, version) if version else None
+
+    async def get_async(self, plant_id):
+        """get() for the event loop: cache misses load in a worker thread"""
+        name = self.model_for(plant_id)
+        return await self._load_async(name, self.models[name]["active"])
+
+    async def shadow_for_async(self, plant_id):
+        """shadow_for() for the event loop"""
+        name = self.model_for(plant_id)
+        version = self.shadows.get(name)
+        return await self._load_async(name, version) if version else None
+
+    async def _load_async(self, name, version):
+        bundle = self.cached(name, version)
+        if bundle is not None:
+            return bundle
+        # TensorFlow loads take seconds: never block ingestion of other plants
+        return await asyncio.to_thread(self.load, name, version)
+
+    def record_shadow(self, plant_id, active_score, shadow_score):
+        name = self.model_for(plant_id)
+        if name in self.shadow_stats:
+            self.shadow_stats[name].update(active_score, shadow_score)
+
+    # ---------------- Loading ----------------
+
+    def cached(self, name, version):
+        """Loaded bundle (marked recently used) or None, without loading"""
+        key = f"{name}@{version}"
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+        return None
+
+    def load(self, name, version):
+        """Return a loaded bundle, evicting least recently used ones over budget"""
+        return self._load_path(name, version, self.models[name]["versions"][version])
+
+    def _load_path(self, name, version, path):
+        bundle = self.cached(name, version)
+        if bundle is not None:
+            return bundle
+
+        key = f"{name}@{version}"
+        with self._lock:
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+
+        # One load per version; concurrent callers wait for it
+        with load_lock:
+            bundle = self.cached(name, version)
+            if bundle is not None:
+                return bundle
+            bundle = ModelBundle(name, version, path)
+            with self._lock:
+                self._cache[key] = bundle
+                self._evict()
+        return bundle
+
+    def preload(self):
+        """Load the active version of every model assigned to plants or groups"""
+        names = {self.default, *self.plants.values(), *(g["model"] for g in self.groups.values())}
+        for name in sorted(names):
+            if name in self.models:
+                self.get_model(name)
+
+    def _evict(self):
+        def used():
+            return sum(b.size_bytes for b in self._cache.values())
+
+        # Always keep the most recently loaded bundle
+        while len(self._cache) > 1 and (
+            len(self._cache) > self.max_loaded or used() > self.memory_budget
+        ):
+            # Pending batches still complete: their flush handle keeps the bundle alive
+            key, _ = self._cache.popitem(last=False)
+            print(f"Evicted model {key} from memory")
+
+    # ---------------- Admin ----------------
+
+    def resolve_path(self, path):
+        """Model directory from an admin request, confined to models_root"""
+        if os.path.isabs(path) or ".." in path.replace("\\", "/").split("/"):
+            raise ValueError("Model path must be relative to the models root without '..'")
+        full = os.path.realpath(os.path.join(self.models_root, path))
+        # Also rejects symlinks pointing outside the root
+        if os.path.commonpath([full, self.models_root]) != self.models_root:
+            raise ValueError("Model path must be inside the models root")
+        return full
+
+    def _load_candidate(self, name, version, path):
+        """Load and validate a requested version without registering it.
+
+        Returns (bundle, resolved path or None). Nothing in the registry
+        changes unless this succeeds, so a failed swap leaves no entry behind.
+        """
+        versions = self.models.get(name, {}).get("versions", {})
+        if path is None:
+            if version not in versions:
+                raise KeyError(f"Unknown version {version} for model {name}")
+            return self.load(name, version), None
+
+        path = self.resolve_path(path)
+        if version in versions and os.path.realpath(versions[version]) != path:
+            # Bundles are cached by name@version: a new path needs a new label
+            raise ValueError(f"{name}@{version} is registered with a different path; use a new version")
+        bundle = self._load_path(name, version, path)
+        if name in self.models and bundle.columns != self.get_model(name).columns:
+            if version not in versions:
+                self._uncache(bundle.key)
+            raise ValueError("Candidate model uses different columns; stream buffers would be invalid")
+        return bundle, path
+
+    def _uncache(self, key):
+        with self._lock:
+            self._cache.pop(key, None)
+
+    def _register_version(self, name, version, path):
+        if name not in self.models:
+            self.models[name] = {"active": version, "versions": {}}
+        if path is not None:
+            self.models[name]["versions"][version] = path
+
+    def swap(self, name, version, path=None):
+        """Load a new version, then atomically make it active"""
+        _, path = self._load_candidate(name, version, path)
+        self._register_version(name, version, path)
+
+        previous = self.models[name]["active"]
+        self.models[name]["active"] = version
+        if self.shadows.get(name) == version:
+            self.clear_shadow(name)
+        self.save()
+        return previous
+
+    def set_shadow(self, name, version, path=None):
+        """Score a candidate version alongside the active one without serving it"""
+        if name not in self.models:
+            raise KeyError(f"Unknown model {name}")
+        _, path = self._load_candidate(name, version, path)
+        self._register_version(name, version, path)
+        self.shadows[name] = version
+        self.shadow_stats[name] = ShadowStats(version)
+
+    def clear_shadow(self, name):
+        self.shadows.pop(name, None)
+        return self.shadow_stats.pop(name, None)
+
+    def assign(self, plant_id, name):
+        if name not in self.models:
+            raise KeyError(f"Unknown model {name}")
+        self.plants[plant_id] = name
+        self.save()
+
+    def save(self):
+        """Persist the registry so restarts pick up the active versions"""
+        config = {
+            "default": self.default,
+            "models": self.models,
+            "plants": self.plants,
+            "groups": self.groups,
+        }
+        tmp = self.config_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(config, f, indent=2)
+        os.replace(tmp, self.config_path)
+
+    def describe(self):
+        with self._lock:
+            loaded = [b.describe() for b in self._cache.values()]
+        return {
+            "default": self.default,
+            "models": self.models,
+            "plants": self.plants,
+            "groups": self.groups,
+            "loaded": loaded,
+            "memory_used_bytes": sum(b["size_bytes"] for b in loaded),
+            "memory_budget_bytes": self.memory_budget,
+            "shadows": {n: s.stats() for n, s in self.shadow_stats.items()},
+        }
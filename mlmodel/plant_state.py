@@ -0,0 +1,300 @@
+# plant_state.py
+# Memory-budgeted per-plant stream state with idle eviction and disk spill.
+
+import hashlib
+import json
+import os
+import pickle
+import sys
+import time
+from collections import OrderedDict, deque
+
+from explainability import PlantExplanation
+
+
+class PlantNotAllowed(Exception):
+    """Raised for plants outside the allow-list or not yet registered"""
+
+
+class PlantState:
+    """Everything the server keeps in memory for one plant"""
+
+    def __init__(self, plant_id, buffer_len, history_len, trend_len=100):
+        self.plant_id = plant_id
+        self.buffer = deque(maxlen=buffer_len)       # Raw sensor rows
+        self.history = deque(maxlen=history_len)     # Recent anomaly scores
+        self.latest_prediction = None
+        self.latest_values = None
+        self.scheduler = None                        # AdaptiveScheduler
+        self.last_errors = None                      # Last (raw_err, feature_err)
+        self.threshold = None                        # PlantThreshold
+        self.alert_tracker = None                    # PlantAlertTracker
+        self.explanation = PlantExplanation(trend_len)  # Error map and contribution trend
+        self.energy = None                           # PlantEnergy
+        self.last_seen = time.monotonic()
+        self.nbytes = 0
+
+    def estimate_nbytes(self):
+        """Approximate resident size: arrays and containers dominate"""
+        size = sys.getsizeof(self.buffer) + sys.getsizeof(self.history)
+        if self.buffer:
+            size += len(self.buffer) * (self.buffer[-1].nbytes + 112)
+        size += len(self.history) * 24
+        if self.scheduler is not None:
+            size += self.scheduler.ewma.nbytes + 1024
+        if self.last_errors is not None:
+            size += self.last_errors[1].nbytes + 112
+        if self.threshold is not None:
+            size += 512
+        size += self.explanation.nbytes
+        if self.energy is not None:
+            size += self.energy.nbytes
+        for d in (self.latest_prediction, self.latest_values):
+            if d:
+                size += sys.getsizeof(d) + 64 * len(d)
+        return size
+
+
+class PlantStateManager:
+    """Bounded set of resident plant states with LRU, idle-timeout and memory-budget eviction.
+
+    Evicted states are pickled to spill_dir (when set) and reloaded on the
+    plant's next row, so a brief silence does not lose buffers, thresholds
+    or open alerts.
+    """
+
+    def __init__(self, factory, max_plants=1000, memory_budget_mb=256, idle_timeout=3600,
+                 spill_dir=None, max_spilled=10000, spill_ttl=7 * 86400,
+                 allow_list=None, require_registration=False, on_reload=None, on_drop=None):
+        self.factory = factory
+        self.on_reload = on_reload
+        self.on_drop = on_drop         # Called with the plant ID when its state is discarded
+        self.max_plants = max_plants
+        self.memory_budget = memory_budget_mb * 1024 * 1024
+        self.idle_timeout = idle_timeout
+        self.spill_dir = spill_dir
+        self.max_spilled = max_spilled
+        self.spill_ttl = spill_ttl
+        self.spilled = OrderedDict()   # Spill file -> (wall-clock write time, plant ID), oldest first
+        self.allowed = set(allow_list) if allow_list is not None else None
+        self.require_registration = require_registration
+        self.registered = set()
+
+        self.states = OrderedDict()
+        self.total_bytes = 0
+
+        # Statistics
+        self.evictions = {"capacity": 0, "memory": 0, "idle": 0}
+        self.reloads = 0
+        self.rejected = 0
+        self.spills_dropped = 0
+
+        if spill_dir:
+            os.makedirs(spill_dir, exist_ok=True)
+            path = os.path.join(spill_dir, "registered.json")
+            if os.path.exists(path):
+                with open(path) as f:
+                    self.registered = set(json.load(f))
+            # Index existing spill files once; afterwards the index is kept in memory
+            files = [os.path.join(spill_dir, n) for n in os.listdir(spill_dir) if n.endswith(".pkl")]
+            for path in sorted(files, key=os.path.getmtime):
+                # The plant ID is only known once the file is loaded
+                self.spilled[path] = (os.path.getmtime(path), None)
+            self._expire_spills()
+
+    # ---------------- Admission ----------------
+
+    def is_allowed(self, plant_id):
+        if self.allowed is not None and plant_id not in self.allowed:
+            return False
+        if self.require_registration and plant_id not in self.registered:
+            return False
+        return True
+
+    def register(self, plant_id):
+        if self.allowed is not None and plant_id not in self.allowed:
+            raise PlantNotAllowed(f"Plant {plant_id} is not in the allow-list")
+        self.registered.add(plant_id)
+        self._save_registered()
+
+    def unregister(self, plant_id):
+        """Forget a plant entirely, including spilled state"""
+        self.registered.discard(plant_id)
+        self._save_registered()
+        state = self.states.pop(plant_id, None)
+        if state is not None:
+            self.total_bytes -= state.nbytes
+        path = self._spill_path(plant_id)
+        if path:
+            self._remove_spill(path)
+        self._dropped(plant_id)
+
+    def _save_registered(self):
+        if not self.spill_dir:
+            return
+        path = os.path.join(self.spill_dir, "registered.json")
+        with open(path + ".tmp", "w") as f:
+            json.dump(sorted(self.registered), f)
+        os.replace(path + ".tmp", path)
+
+    # ---------------- Access ----------------
+
+    def get(self, plant_id, create=True):
+        """State for an ingesting plant: resident, reloaded from disk, or new (None without create)"""
+        state = self.states.get(plant_id)
+        if state is not None:
+            self.states.move_to_end(plant_id)
+            return state
+
+        if not self.is_allowed(plant_id):
+            self.rejected += 1
+            raise PlantNotAllowed(f"Plant {plant_id} is not registered")
+
+        state = self._reload(plant_id)
+        if state is None:
+            if not create:
+                return None
+            state = self.factory(plant_id)
+        state.nbytes = state.estimate_nbytes()
+        self.states[plant_id] = state
+        self.total_bytes += state.nbytes
+        self._enforce_limits()
+        return state
+
+    def touch(self, state):
+        """Mark a plant active and refresh its size estimate after an update"""
+        state.last_seen = time.monotonic()
+        size = state.estimate_nbytes()
+        self.total_bytes += size - state.nbytes
+        state.nbytes = size
+        if self.total_bytes > self.memory_budget:
+            self._enforce_limits()
+
+    # ---------------- Eviction ----------------
+
+    def _enforce_limits(self):
+        # Never evict the most recently used plant (the one being served)
+        while len(self.states) > 1:
+            if len(self.states) > self.max_plants:
+                reason = "capacity"
+            elif self.total_bytes > self.memory_budget:
+                reason = "memory"
+            else:
+                break
+            plant_id = next(iter(self.states))
+            self._evict(plant_id, reason)
+
+    def evict_idle(self, now=None):
+        """Evict plants silent for longer than idle_timeout; returns the count"""
+        now = time.monotonic() if now is None else now
+        idle = [p for p, s in self.states.items() if now - s.last_seen > self.idle_timeout]
+        for plant_id in idle:
+            self._evict(plant_id, "idle")
+        self._expire_spills()
+        return len(idle)
+
+    def _evict(self, plant_id, reason):
+        state = self.states.pop(plant_id)
+        self.total_bytes -= state.nbytes
+        self.evictions[reason] += 1
+        if self.spill_dir:
+            self._spill(state)
+        else:
+            self._dropped(plant_id)
+
+    def spill_all(self):
+        """Write every resident state to disk (e.g. on shutdown)"""
+        for state in self.states.values():
+            self._spill(state)
+
+    # ---------------- Disk Spill ----------------
+
+    def _spill_path(self, plant_id):
+        if not self.spill_dir:
+            return None
+        # Plant IDs come from clients: hash them into safe file names
+        name = hashlib.sha1(plant_id.encode()).hexdigest()
+        return os.path.join(self.spill_dir, f"{name}.pkl")
+
+    def _spill(self, state):
+        path = self._spill_path(state.plant_id)
+        if path is None:
+            return
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+        self.spilled[path] = (time.time(), state.plant_id)
+        self.spilled.move_to_end(path)
+
+        # Bound disk use: rogue or mistyped plant IDs must not accumulate
+        while len(self.spilled) > self.max_spilled:
+            self._drop_spill(next(iter(self.spilled)))
+            self.spills_dropped += 1
+
+    def _expire_spills(self):
+        cutoff = time.time() - self.spill_ttl
+        while self.spilled:
+            path, (written, _) = next(iter(self.spilled.items()))
+            if written >= cutoff:
+                break
+            self._drop_spill(path)
+            self.spills_dropped += 1
+
+    def _remove_spill(self, path):
+        entry = self.spilled.pop(path, None)
+        if os.path.exists(path):
+            os.remove(path)
+        return entry
+
+    def _drop_spill(self, path):
+        # Discarded rather than reloaded: the plant's state is gone for good
+        entry = self._remove_spill(path)
+        if entry is not None and entry[1] is not None:
+            self._dropped(entry[1])
+
+    def _dropped(self, plant_id):
+        # spill_all() leaves states resident, so their spill file is only a copy
+        if self.on_drop is not None and plant_id not in self.states:
+            self.on_drop(plant_id)
+
+    def _reload(self, plant_id):
+        path = self._spill_path(plant_id)
+        if path is None or path not in self.spilled:
+            return None
+        try:
+            with open(path, "rb") as f:
+                state = pickle.load(f)
+        except Exception as e:
+            print(f"Could not reload state of {plant_id}: {e}")
+            self._remove_spill(path)
+            self._dropped(plant_id)
+            return None
+        self._remove_spill(path)
+        state.last_seen = time.monotonic()
+        self.reloads += 1
+        if self.on_reload is not None:
+            self.on_reload(state)
+        return state
+
+    # ---------------- Metrics ----------------
+
+    def metrics(self):
+        sizes = [s.nbytes for s in self.states.values()]
+        return {
+            "resident_plants": len(self.states),
+            "max_plants": self.max_plants,
+            "spilled_plants": len(self.spilled),
+            "max_spilled": self.max_spilled,
+            "spills_dropped": self.spills_dropped,
+            "resident_bytes": self.total_bytes,
+            "memory_budget_bytes": self.memory_budget,
+            "mean_bytes_per_plant": int(sum(sizes) / len(sizes)) if sizes else 0,
+            "max_bytes_per_plant": max(sizes, default=0),
+            "evictions": dict(self.evictions),
+            "reloads": self.reloads,
+            "rejected_rows": self.rejected,
+            "registration_required": self.require_registration,
+            "allow_list_size": len(self.allowed) if self.allowed is not None else None,
+            "registered_plants": len(self.registered),
+        }
@@ -10,6 +10,9 @@ from termcolor import colored
 
 URL = "http://localhost:8000/ingest"
 
+# Ground-truth columns written by kiln_generator.py; never sent as sensor values
+NON_SENSOR_COLUMNS = {"timestamp", "plant_id", "is_anomaly", "failure_type"}
+
 # Severity → Color mapping
 SEVERITY_COLORS = {
     'normal': 'green',
@@ -150,7 +153,7 @@ def main(args):
                 row_count += 1
 
                 timestamp = row.get("timestamp", "")
-                sensor_values = {k: float(v) for k, v in row.items() if k != "timestamp"}
+                sensor_values = {k: float(v) for k, v in row.items() if k not in NON_SENSOR_COLUMNS}
 
                 # Print outgoing data
                 print_data_sent(timestamp, sensor_values)
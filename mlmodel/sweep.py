@@ -0,0 +1,268 @@
+# sweep.py
+# Usage: python sweep.py --csv kiln_dataset.csv --seq_len 40 60 80 --latent 16 32 --epochs 20
+#
+# Trains a grid of configurations in parallel, computes thresholds for many
+# percentiles from one validation pass and ranks every (config, percentile)
+# by detection quality on the anomaly datasets vs. inference cost.
+
+import argparse
+import itertools
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import multiprocessing as mp
+
+import numpy as np
+import pandas as pd
+import joblib
+
+from data_loader import (load_frame, fill_missing, load_scaled, cache_base, resample_segments,
+                         MAX_FILL_ROWS)
+
+LABEL_COLUMN = 'is_anomaly'
+# Injected faults shift at least one sensor by several sigmas, so rows of the
+# anomaly datasets without a label column are labeled by |z| against the
+# training scaler.
+LABEL_Z = 4.0
+# Rough resident memory of one TensorFlow worker on top of its training data
+WORKER_OVERHEAD_BYTES = 1.5 * 1024 ** 3
+
+
+# ---------------- Shared Data Cache ----------------
+
+def prepare_cache(args):
+    """Scale training and evaluation data once and store them as .npy files"""
+    os.makedirs(args.cache_dir, exist_ok=True)
+
+    scaled, segments, scaler, columns = load_scaled(
+        args.csv, cache_dir=args.cache_dir, max_fill=args.max_fill
+    )
+    train_base = cache_base(args.cache_dir, args.csv, columns, args.max_fill)
+
+    eval_sets = []
+    for path in args.eval:
+        name = os.path.splitext(os.path.basename(path))[0]
+        raw = fill_missing(load_frame(path, columns, extra=[LABEL_COLUMN]), columns)
+        labeled = LABEL_COLUMN in raw.columns
+        if labeled:
+            raw[LABEL_COLUMN] = raw[LABEL_COLUMN].astype('float32')
+        # Same gap handling as training: resampled rows carry the previous row's label
+        values, segments = resample_segments(
+            raw, columns + ([LABEL_COLUMN] if labeled else []), args.max_fill
+        )
+        eval_scaled = scaler.transform(values[:, :len(columns)]).astype('float32')
+
+        if labeled:
+            labels = values[:, -1] > 0.5
+        else:
+            labels = np.any(np.abs(eval_scaled) > LABEL_Z, axis=1)
+
+        np.save(os.path.join(args.cache_dir, f'eval_{name}.npy'), eval_scaled)
+        np.save(os.path.join(args.cache_dir, f'segments_{name}.npy'), segments)
+        np.save(os.path.join(args.cache_dir, f'labels_{name}.npy'), labels)
+        eval_sets.append(name)
+        print(f"✓ Cached {name}: {len(values)} rows, {labels.mean() * 100:.2f}% anomalous")
+
+    with open(os.path.join(args.cache_dir, 'columns.json'), 'w') as f:
+        json.dump(columns, f)
+
+    return train_base, scaled.nbytes, eval_sets
+
+
+def max_workers(requested, n_configs, train_bytes, max_seq_len):
+    """Bound parallelism by CPU cores and available memory"""
+    cpus = os.cpu_count() or 1
+    workers = min(requested or cpus, cpus, n_configs)
+
+    try:
+        available = os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_AVPHYS_PAGES')
+    except (ValueError, OSError, AttributeError):
+        return workers
+
+    # Keras materializes the window view as a dense tensor inside each worker
+    per_worker = train_bytes * max_seq_len + WORKER_OVERHEAD_BYTES
+    return max(1, min(workers, int(available // per_worker)))
+
+
+# ---------------- Worker ----------------
+
+def detection_metrics(errors, labels, threshold):
+    """Precision, recall and F1 of flagging errors above threshold"""
+    flagged = errors > threshold
+    tp = int(np.sum(flagged & labels))
+    fp = int(np.sum(flagged & ~labels))
+    fn = int(np.sum(~flagged & labels))
+    precision = tp / (tp + fp) if tp + fp else 0.0
+    recall = tp / (tp + fn) if tp + fn else 0.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    return precision, recall, f1
+
+
+def run_config(config, cache_dir, train_base, eval_sets, percentiles, threads, save_dir):
+    """Train one configuration and evaluate it at every percentile"""
+    import tensorflow as tf
+    from train_model import (build_autoencoder, segment_sequences, segment_window_ends,
+                             compute_thresholds, reconstruction_errors, save_artifacts,
+                             training_callbacks)
+
+    tf.config.threading.set_intra_op_parallelism_threads(threads)
+    tf.config.threading.set_inter_op_parallelism_threads(1)
+
+    seq_len, latent = config['seq_len'], config['latent']
+    name = f"seq{seq_len}_lat{latent}"
+
+    # Memory-mapped: every worker shares the cached arrays through the page cache
+    scaled = np.load(train_base + '.npy', mmap_mode='r')
+    segments = np.load(train_base + '_segments.npy')
+    seqs = segment_sequences(scaled, segments, seq_len)
+    split = int(len(seqs) * 0.8)
+    x_train, x_val = seqs[:split], seqs[split:]
+
+    model = build_autoencoder(seq_len, scaled.shape[1], latent_dim=latent)
+    start = time.perf_counter()
+    history = model.fit(
+        x_train, x_train,
+        epochs=config['epochs'],
+        batch_size=config['batch'],
+        validation_data=(x_val, x_val),
+        callbacks=training_callbacks(verbose=0),
+        verbose=0
+    )
+    train_seconds = time.perf_counter() - start
+
+    thresholds, val_errors = compute_thresholds(model, x_val, percentiles)
+
+    # One scoring pass per evaluation set, reused for every percentile
+    scored = {}
+    infer_seconds, infer_windows = 0.0, 0
+    for eval_name in eval_sets:
+        values = np.load(os.path.join(cache_dir, f'eval_{eval_name}.npy'), mmap_mode='r')
+        labels = np.load(os.path.join(cache_dir, f'labels_{eval_name}.npy'))
+        eval_segments = np.load(os.path.join(cache_dir, f'segments_{eval_name}.npy'))
+        # Windows never span an outage, as in training
+        windows = segment_sequences(values, eval_segments, seq_len)
+
+        start = time.perf_counter()
+        errors = reconstruction_errors(model, windows)
+        infer_seconds += time.perf_counter() - start
+        infer_windows += len(windows)
+
+        # A window is scored at its last row, as in the realtime API
+        scored[eval_name] = (errors, labels[segment_window_ends(eval_segments, seq_len)])
+
+    rows = []
+    for p, threshold in thresholds.items():
+        row = {
+            'run': name,
+            'seq_len': seq_len,
+            'latent': latent,
+            'percentile': p,
+            'threshold': round(threshold, 6),
+            'val_loss': round(float(min(history.history['val_loss'])), 6),
+            'epochs_run': len(history.history['val_loss']),
+            'params': model.count_params(),
+            'train_seconds': round(train_seconds, 1),
+            'infer_ms_per_window': round(infer_seconds * 1000 / max(infer_windows, 1), 4),
+        }
+        f1s = []
+        for eval_name, (errors, labels) in scored.items():
+            precision, recall, f1 = detection_metrics(errors, labels, threshold)
+            row[f'{eval_name}_precision'] = round(precision, 4)
+            row[f'{eval_name}_recall'] = round(recall, 4)
+            row[f'{eval_name}_f1'] = round(f1, 4)
+            f1s.append(f1)
+        row['mean_f1'] = round(float(np.mean(f1s)), 4) if f1s else 0.0
+        rows.append(row)
+
+    if save_dir:
+        # Ship the threshold this run scored best with (ties: higher percentile, fewer alarms)
+        p = max(rows, key=lambda r: (r['mean_f1'], r['percentile']))['percentile']
+        scaler = joblib.load(train_base + '_scaler.pkl')
+        with open(os.path.join(cache_dir, 'columns.json')) as f:
+            columns = json.load(f)
+        save_artifacts(os.path.join(save_dir, name), model, scaler, {
+            'columns': columns,
+            'seq_len': seq_len,
+            'threshold': thresholds[p],
+            'n_features': len(columns),
+            'percentile': p,
+            'val_mean_error': float(np.mean(val_errors)),
+            'val_std_error': float(np.std(val_errors))
+        })
+    return rows
+
+
+# ---------------- Main ----------------
+
+def main(args):
+    print("\n" + "="*70)
+    print("🔧 CarbonEdge AI - Hyperparameter & Threshold Sweep")
+    print("="*70)
+
+    train_base, train_bytes, eval_sets = prepare_cache(args)
+
+    grid = [
+        {'seq_len': s, 'latent': l, 'epochs': args.epochs, 'batch': args.batch}
+        for s, l in itertools.product(args.seq_len, args.latent)
+    ]
+    workers = max_workers(args.workers, len(grid), train_bytes, max(args.seq_len))
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    print(f"\n✓ {len(grid)} configurations | {workers} workers x {threads} threads")
+
+    rows = []
+    # Spawn: TensorFlow is not fork-safe once initialised
+    ctx = mp.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as pool:
+        futures = {
+            pool.submit(run_config, cfg, args.cache_dir, train_base, eval_sets,
+                        args.percentiles, threads, args.save_models): cfg
+            for cfg in grid
+        }
+        for fut in as_completed(futures):
+            cfg = futures[fut]
+            try:
+                result = fut.result()
+            except Exception as e:
+                print(f"  ✗ seq_len={cfg['seq_len']} latent={cfg['latent']} failed: {e}")
+                continue
+            best = max(result, key=lambda r: r['mean_f1'])
+            print(f"  ✓ {best['run']}: best mean F1 {best['mean_f1']:.4f} "
+                  f"@ p{best['percentile']} ({best['infer_ms_per_window']:.3f} ms/window)")
+            rows.extend(result)
+
+    if not rows:
+        print("\n❌ No configuration finished successfully")
+        return
+
+    board = pd.DataFrame(rows).sort_values(
+        ['mean_f1', 'infer_ms_per_window'], ascending=[False, True]
+    )
+    board.to_csv(args.out, index=False)
+
+    print(f"\n{'='*70}")
+    print(f"🏆 Leaderboard (top 10 of {len(board)}) → {args.out}")
+    print(f"{'='*70}")
+    cols = ['run', 'percentile', 'threshold', 'mean_f1', 'infer_ms_per_window', 'params']
+    print(board[cols].head(10).to_string(index=False))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Parallel CarbonEdge hyperparameter and threshold sweep')
+    parser.add_argument('--csv', required=True, help='Path to training CSV file')
+    parser.add_argument('--eval', nargs='+', default=['anomaly.csv', 'heavy_anomaly.csv'],
+                        help='Anomaly datasets to evaluate against')
+    parser.add_argument('--seq_len', type=int, nargs='+', default=[40, 60, 80], help='Sequence lengths')
+    parser.add_argument('--latent', type=int, nargs='+', default=[16, 32], help='Latent dimension sizes')
+    parser.add_argument('--percentiles', type=float, nargs='+', default=[95, 97, 98, 99, 99.5],
+                        help='Threshold percentiles evaluated per run')
+    parser.add_argument('--epochs', type=int, default=20, help='Training epochs')
+    parser.add_argument('--batch', type=int, default=64, help='Batch size')
+    parser.add_argument('--workers', type=int, default=0, help='Parallel workers (0 = auto)')
+    parser.add_argument('--cache_dir', default='.sweep_cache', help='Scaled data cache directory')
+    parser.add_argument('--max_fill', type=int, default=MAX_FILL_ROWS,
+                        help='Resample timestamp gaps up to this many rows; split at longer ones')
+    parser.add_argument('--save_models', default=None, help='Directory to save every trained model (with its best-F1 threshold)')
+    parser.add_argument('--out', default='sweep_leaderboard.csv', help='Leaderboard CSV')
+    args = parser.parse_args()
+    main(args)
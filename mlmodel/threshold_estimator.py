@@ -0,0 +1,136 @@
+# threshold_estimator.py
+# Per-plant streaming threshold estimation over live reconstruction errors.
+
+import numpy as np
+
+
+class P2Quantile:
+    """P² streaming quantile estimator (Jain & Chlamtac) with exponential fading.
+
+    Keeps five markers regardless of stream length, so memory is constant and
+    each update is O(1). With decay < 1 the marker positions are shrunk after
+    every update, which caps the effective sample size at ~1 / (1 - decay)
+    observations and lets the estimate follow a plant whose noise floor moves.
+    """
+
+    def __init__(self, p, decay=1.0):
+        self.p = p
+        self.decay = decay
+        self.q = []                       # Marker heights
+        self.n = [0.0, 1.0, 2.0, 3.0, 4.0]  # Marker positions (0-based)
+        self.desired = [0.0, 2 * p, 4 * p, 2 + 2 * p, 4.0]
+        self.increments = [0.0, p / 2, p, (1 + p) / 2, 1.0]
+        self.count = 0
+
+    def update(self, x):
+        self.count += 1
+        if len(self.q) < 5:
+            self.q.append(float(x))
+            self.q.sort()
+            return
+
+        q, n = self.q, self.n
+        if x < q[0]:
+            q[0] = x
+            k = 0
+        elif x >= q[4]:
+            q[4] = x
+            k = 3
+        else:
+            k = 0
+            while x >= q[k + 1]:
+                k += 1
+
+        for i in range(k + 1, 5):
+            n[i] += 1
+        for i in range(5):
+            self.desired[i] += self.increments[i]
+
+        for i in range(1, 4):
+            d = self.desired[i] - n[i]
+            if (d >= 1 and n[i + 1] - n[i] > 1) or (d <= -1 and n[i - 1] - n[i] < -1):
+                d = 1.0 if d > 0 else -1.0
+                candidate = self._parabolic(i, d)
+                if not q[i - 1] < candidate < q[i + 1]:
+                    candidate = self._linear(i, d)
+                q[i] = candidate
+                n[i] += d
+
+        if self.decay < 1.0:
+            for i in range(1, 5):
+                n[i] *= self.decay
+                self.desired[i] *= self.decay
+
+    def _parabolic(self, i, d):
+        q, n = self.q, self.n
+        return q[i] + d / (n[i + 1] - n[i - 1]) * (
+            (n[i] - n[i - 1] + d) * (q[i + 1] - q[i]) / (n[i + 1] - n[i])
+            + (n[i + 1] - n[i] - d) * (q[i] - q[i - 1]) / (n[i] - n[i - 1])
+        )
+
+    def _linear(self, i, d):
+        q, n = self.q, self.n
+        j = i + int(d)
+        return q[i] + d * (q[j] - q[i]) / (n[j] - n[i])
+
+    def value(self):
+        if not self.q:
+            return None
+        if len(self.q) < 5:
+            # Not enough samples for markers yet: exact quantile of what we have
+            return float(np.percentile(self.q, self.p * 100))
+        return float(self.q[2])
+
+
+class PlantThreshold:
+    """Streaming reconstruction-error threshold for a single plant and model"""
+
+    def __init__(self, model, percentile=99, decay=0.999, warmup=200,
+                 min_factor=0.5, max_factor=3.0):
+        self.model = model
+        self.percentile = percentile
+        self.warmup = warmup
+        self.min_factor = min_factor
+        self.max_factor = max_factor
+        self.estimator = P2Quantile(percentile / 100.0, decay)
+
+    def update(self, error, global_threshold):
+        """Feed one error, winsorized at the upper clamp so outliers cannot drag the estimate"""
+        self.estimator.update(min(error, global_threshold * self.max_factor))
+
+    @property
+    def samples(self):
+        return self.estimator.count
+
+    def value(self, global_threshold):
+        """Plant threshold clamped around the global one, None during warm-up"""
+        if self.samples < self.warmup:
+            return None
+        estimate = self.estimator.value()
+        return float(np.clip(
+            estimate,
+            global_threshold * self.min_factor,
+            global_threshold * self.max_factor,
+        ))
+
+    def effective(self, global_threshold, mode):
+        """Threshold used for scoring under the given mode"""
+        plant = self.value(global_threshold)
+        if mode == "global" or plant is None:
+            return global_threshold
+        if mode == "max":
+            return max(global_threshold, plant)
+        return plant
+
+    def describe(self, global_threshold, mode):
+        plant = self.value(global_threshold)
+        return {
+            "mode": mode,
+            "model": self.model,
+            "percentile": self.percentile,
+            "samples": self.samples,
+            "warmed_up": plant is not None,
+            "global": global_threshold,
+            "plant": plant,
+            "effective": self.effective(global_threshold, mode),
+        }
@@ -3,33 +3,29 @@
 
 import argparse
 import numpy as np
-import pandas as pd
 import tensorflow as tf
-from sklearn.preprocessing import StandardScaler
 import os
 import json
 import joblib
-
-def load_csv(path):
-    """Load CSV and handle missing values robustly"""
-    df = pd.read_csv(path)
-    print(f"✓ Loaded {len(df)} rows from {path}")
-    
-    # Select only numeric columns
-    df = df.select_dtypes(include=[np.number])
-    
-    # Handle missing values: forward fill, then backward fill, then zeros
-    df = df.fillna(method='ffill').fillna(method='bfill').fillna(0)
-    
-    print(f"✓ Using {len(df.columns)} numeric columns")
-    return df
+from data_loader import load_scaled, MAX_FILL_ROWS
 
 def create_sequences(values, seq_len):
-    """Create sliding window sequences for LSTM autoencoder"""
-    sequences = []
-    for i in range(len(values) - seq_len + 1):
-        sequences.append(values[i:i+seq_len])
-    return np.array(sequences)
+    """Create sliding window sequences for LSTM autoencoder (zero-copy view)"""
+    windows = np.lib.stride_tricks.sliding_window_view(values, seq_len, axis=0)
+    # (N - seq_len + 1, n_features, seq_len) -> (N - seq_len + 1, seq_len, n_features)
+    return windows.transpose(0, 2, 1)
+
+def segment_sequences(values, segments, seq_len):
+    """Sliding windows that never cross a segment boundary (timestamp outage)"""
+    parts = [create_sequences(values[lo:hi], seq_len) for lo, hi in segments if hi - lo >= seq_len]
+    if not parts:
+        return np.empty((0, seq_len, values.shape[1]), dtype=values.dtype)
+    return parts[0] if len(parts) == 1 else np.concatenate(parts)
+
+def segment_window_ends(segments, seq_len):
+    """Row index of the last row of every window built by segment_sequences"""
+    ends = [np.arange(lo + seq_len - 1, hi) for lo, hi in segments if hi - lo >= seq_len]
+    return np.concatenate(ends) if ends else np.empty(0, dtype=np.int64)
 
 def build_autoencoder(seq_len, n_features, latent_dim=32):
     """Build robust LSTM autoencoder with dropout for stability"""
@@ -50,33 +46,63 @@ def build_autoencoder(seq_len, n_features, latent_dim=32):
     model.compile(optimizer=tf.keras.optimizers.Adam(learning_rate=0.001), loss='mse')
     return model
 
+def reconstruction_errors(model, sequences, batch_size=256):
+    """MSE per sequence: mean over time and features"""
+    preds = model.predict(sequences, batch_size=batch_size, verbose=0)
+    return np.mean(np.square(preds - sequences), axis=(1, 2))
+
+def training_callbacks(verbose=1):
+    """Early stopping and LR decay on validation loss"""
+    return [
+        tf.keras.callbacks.EarlyStopping(
+            monitor='val_loss', 
+            patience=5, 
+            restore_best_weights=True,
+            verbose=verbose
+        ),
+        tf.keras.callbacks.ReduceLROnPlateau(
+            monitor='val_loss',
+            factor=0.5,
+            patience=3,
+            verbose=verbose
+        )
+    ]
+
+def compute_thresholds(model, sequences, percentiles):
+    """Compute thresholds for many percentiles from a single validation pass"""
+    mse = reconstruction_errors(model, sequences)
+    values = np.percentile(mse, percentiles)
+    return {p: float(v) for p, v in zip(percentiles, values)}, mse
+
 def compute_threshold(model, sequences, percentile=99):
     """Compute anomaly threshold using percentile of reconstruction errors"""
-    preds = model.predict(sequences, verbose=0)
-    # MSE per sequence: mean over time and features
-    mse = np.mean(np.square(preds - sequences), axis=(1, 2))
-    threshold = float(np.percentile(mse, percentile))
-    return threshold, mse
+    thresholds, mse = compute_thresholds(model, sequences, [percentile])
+    return thresholds[percentile], mse
+
+def save_artifacts(out_dir, model, scaler, meta):
+    """Save model, scaler and meta.json in the layout app.py loads"""
+    os.makedirs(out_dir, exist_ok=True)
+    model.save(os.path.join(out_dir, 'ae_model'))
+    joblib.dump(scaler, os.path.join(out_dir, 'scaler.pkl'))
+    with open(os.path.join(out_dir, 'meta.json'), 'w') as f:
+        json.dump(meta, f, indent=2)
 
 def main(args):
     print("\n" + "="*70)
     print("🔧 CarbonEdge AI - Model Training Pipeline")
     print("="*70)
     
-    # Load data
-    df = load_csv(args.csv)
-    column_names = list(df.columns)
-    values = df.values.astype('float32')
-    
-    # Scale data
-    print("\n✓ Fitting StandardScaler...")
-    scaler = StandardScaler()
-    values_scaled = scaler.fit_transform(values)
+    # Load and scale data (memory-mapped from cache on repeated runs)
+    print("\n✓ Loading data and fitting StandardScaler...")
+    values_scaled, segments, scaler, column_names = load_scaled(
+        args.csv, cache_dir=args.cache_dir, max_fill=args.max_fill
+    )
+    print(f"  {len(values_scaled)} rows in {len(segments)} gap-free segment(s)")
     
     # Create sequences
     seq_len = args.seq_len
     print(f"\n✓ Creating sequences (seq_len={seq_len})...")
-    seqs = create_sequences(values_scaled, seq_len)
+    seqs = segment_sequences(values_scaled, segments, seq_len)
     print(f"  Generated {len(seqs)} sequences of shape {seqs.shape}")
     
     # Train/val split
@@ -87,34 +113,19 @@ def main(args):
     print(f"\n✓ Train: {len(x_train)} sequences | Val: {len(x_val)} sequences")
     
     # Build model
-    n_features = values.shape[1]
+    n_features = values_scaled.shape[1]
     print(f"\n✓ Building LSTM Autoencoder (features={n_features}, latent_dim={args.latent})...")
     model = build_autoencoder(seq_len, n_features, latent_dim=args.latent)
     model.summary()
     
     # Train
     print("\n✓ Training model...")
-    callbacks = [
-        tf.keras.callbacks.EarlyStopping(
-            monitor='val_loss', 
-            patience=5, 
-            restore_best_weights=True,
-            verbose=1
-        ),
-        tf.keras.callbacks.ReduceLROnPlateau(
-            monitor='val_loss',
-            factor=0.5,
-            patience=3,
-            verbose=1
-        )
-    ]
-    
     history = model.fit(
         x_train, x_train,
         epochs=args.epochs,
         batch_size=args.batch,
         validation_data=(x_val, x_val),
-        callbacks=callbacks,
+        callbacks=training_callbacks(),
         verbose=1
     )
     
@@ -127,11 +138,7 @@ def main(args):
     
     # Save artifacts
     out_dir = args.out_dir
-    os.makedirs(out_dir, exist_ok=True)
-    
     print(f"\n✓ Saving model to {out_dir}...")
-    model.save(os.path.join(out_dir, 'ae_model'))
-    joblib.dump(scaler, os.path.join(out_dir, 'scaler.pkl'))
     
     meta = {
         'columns': column_names,
@@ -143,8 +150,7 @@ def main(args):
         'val_std_error': float(np.std(val_errors))
     }
     
-    with open(os.path.join(out_dir, 'meta.json'), 'w') as f:
-        json.dump(meta, f, indent=2)
+    save_artifacts(out_dir, model, scaler, meta)
     
     print(f"\n{'='*70}")
     print("✅ Training complete! Model artifacts saved.")
@@ -152,12 +158,15 @@ def main(args):
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='Train CarbonEdge LSTM Autoencoder')
-    parser.add_argument('--csv', required=True, help='Path to training CSV file')
+    parser.add_argument('--csv', required=True, help='Path to training CSV or Parquet file')
     parser.add_argument('--seq_len', type=int, default=60, help='Sequence length for LSTM')
     parser.add_argument('--latent', type=int, default=32, help='Latent dimension size')
     parser.add_argument('--epochs', type=int, default=20, help='Training epochs')
     parser.add_argument('--batch', type=int, default=64, help='Batch size')
     parser.add_argument('--percentile', type=int, default=99, help='Threshold percentile (95-99)')
     parser.add_argument('--out_dir', default='carbonedge_model', help='Output directory')
+    parser.add_argument('--cache_dir', default='.data_cache', help='Scaled data cache ("" to disable)')
+    parser.add_argument('--max_fill', type=int, default=MAX_FILL_ROWS,
+                        help='Resample timestamp gaps up to this many rows; split at longer ones')
     args = parser.parse_args()
     main(args)
\ No newline at end of file